@@ -1,16 +1,79 @@
 # ai/traffic_predictor.py
-import random
+import math
 
+import numpy as np
+
+DIR_INDEX = {"N": 0, "S": 1, "E": 2, "W": 3}
+LEVELS = ("Low Traffic", "Medium Traffic", "High Traffic")
+
+# Streaming per-approach demand forecaster. Every tick it reads the cumulative
+# arrival/crossing totals from TrafficCounters and folds the deltas into
+# exponentially weighted estimates, one slot per approach (N, S, E, W):
+#   arrival_rate    vehicles/s spawning on the approach
+#   discharge_rate  vehicles/s crossing while the approach is green with vehicles
+#                   waiting, start-up losses included (starts at saturation_flow)
+#   queue_growth    vehicles/s the waiting queue is growing (negative while it drains)
+# State is a handful of 4-element arrays, so updates are O(1) and memory does
+# not grow with run length. `tau` is the averaging time constant in seconds.
 class TrafficPredictor:
-    def __init__(self, name=""):
+    def __init__(self, name="", tau=60.0, saturation_flow=1.0, startup_lost_time=2.0, levels=(0.3, 0.8)):
         self.name = name
-        self.history = []
+        self.tau = tau
+        self.startup_lost_time = startup_lost_time
+        self.levels = levels
+        self.arrival_rate = np.zeros(4)
+        self.discharge_rate = np.full(4, float(saturation_flow))
+        self.queue_growth = np.zeros(4)
+        self.waiting = np.zeros(4)
+        self.last_arrived = np.zeros(4, dtype=np.int64)
+        self.last_crossed = np.zeros(4, dtype=np.int64)
         self.current_green_duration = 0
 
-    def train(self):
-        print(f"'{self.name}' model is ready (placeholder).")
+    def observe(self, counters, green, dt, ticks=1):
+        # green: per-approach bool array, True where the approach had a green light this tick.
+        # ticks > 1 stands for that many ticks of dt over which the counters and lights
+        # do not change; the decay is still applied tick by tick so the estimates
+        # round exactly as they would have.
+        if dt <= 0:
+            return
+        a = 1.0 - math.exp(-dt / self.tau)
+        arrived = counters.arrived - self.last_arrived
+        crossed = counters.crossed - self.last_crossed
+        self.last_arrived[:] = counters.arrived
+        self.last_crossed[:] = counters.crossed
+        self.arrival_rate += a * (arrived / dt - self.arrival_rate)
+        saturated = green & (self.waiting > 0)
+        self.discharge_rate[saturated] += a * (crossed[saturated] / dt - self.discharge_rate[saturated])
+        self.queue_growth += a * ((counters.waiting - self.waiting) / dt - self.queue_growth)
+        self.waiting[:] = counters.waiting
+        saturated = green & (self.waiting > 0)
+        for _ in range(ticks - 1):
+            self.arrival_rate -= a * self.arrival_rate
+            self.discharge_rate[saturated] -= a * self.discharge_rate[saturated]
+            self.queue_growth -= a * self.queue_growth
+
+    def forecast(self, horizon):
+        # Expected arrivals and waiting queue per approach `horizon` seconds from now.
+        return self.arrival_rate * horizon, np.maximum(self.waiting + self.queue_growth * horizon, 0.0)
+
+    def green_time(self, directions, waiting, min_green, max_green):
+        # Time to discharge the queue forecast for when the group starts moving, at the
+        # learned service rate, worst approach of the group: what is waiting plus the
+        # arrivals expected during the start-up loss, or the queue's own trend if that
+        # is higher. The learned rate already includes the start-up loss, so it is not
+        # added again. An approach receiving traffic faster than it can discharge it
+        # gets the maximum.
+        idx = [DIR_INDEX[d] for d in directions]
+        arrivals, queue = self.forecast(self.startup_lost_time)
+        q = np.maximum(waiting[idx] + arrivals[idx], queue[idx])
+        rate = self.discharge_rate[idx]
+        if np.any((self.arrival_rate[idx] >= rate) & (waiting[idx] > 0)):
+            needed = max_green
+        else:
+            needed = float(np.max(q / np.maximum(rate, 1e-9)))
+        self.current_green_duration = round(min(max_green, max(min_green, needed)), 1)
+        return self.current_green_duration
 
     def predict_next(self):
-        prediction = random.choice(["Low Traffic", "Medium Traffic", "High Traffic"])
-        self.history.append(prediction)
-        return prediction
+        total = float(self.arrival_rate.sum())
+        return LEVELS[sum(total > level for level in self.levels)]
@@ -0,0 +1,253 @@
+# simulation/bench.py
+# Tick throughput benchmarks at fixed vehicle populations. Every case builds a
+# seeded Simulation, fills it with `population` vehicles and keeps it there
+# (each vehicle that drives off re-enters at the start of its lane), then
+# times a fixed number of ticks either headless or rendering every tick to an
+# offscreen pygame surface. Each case runs in a fresh process so peak memory
+# is its own.
+#
+# The realtime case runs the app's own workload instead, a default Simulation
+# spawning its rush-hour demand (a dozen or so vehicles live), and reports
+# simulated seconds per wall-clock second. --compare checks it against the
+# baseline like any other case, so a fixed per-tick cost that only shows at
+# small populations is caught; --min-realtime adds an absolute floor, for
+# runs on a known machine.
+#
+#   python -m simulation.bench --out bench/baseline.json
+#   python -m simulation.bench --compare bench/baseline.json --tolerance 0.25
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from simulation.config import WIDTH, HEIGHT, VEHICLE_HEIGHT
+from simulation.engine import Simulation
+from simulation.profiler import Profiler
+from simulation.vehicle_store import DIR_CODE, TRAVEL_SIGN, ON_Y_AXIS
+
+POPULATIONS = (10, 100, 1000, 10000)
+# spacing is the gap in px between consecutive vehicles in a lane (2.5 car
+# lengths is the following distance, so 150 never brakes). free_flow spreads
+# vehicles over the whole lane, so it only takes as many as its lanes hold at
+# that gap (max_population, 20) and larger populations are skipped; its own
+# populations, used unless --populations is given, measure how the tick cost
+# grows per vehicle within that range. The others start them queued back from
+# the stop line; populations too large for the lane get a smaller gap, i.e.
+# the vehicles overlap, which is still a fair load for the per-tick code.
+SCENARIOS = {
+    "free_flow": {"directions": ("N", "S"), "spacing": 150, "queued": False, "smart": False,
+                  "timing": {"fixed_green_duration": 1e9}, "emergency_every": None, "populations": (5, 10, 15, 20)},
+    "saturated": {"directions": ("N", "S", "E", "W"), "spacing": 50, "queued": True, "smart": True,
+                  "timing": None, "emergency_every": None, "populations": POPULATIONS},
+    "emergency": {"directions": ("N", "S", "E", "W"), "spacing": 50, "queued": True, "smart": True,
+                  "timing": None, "emergency_every": 5.0, "populations": POPULATIONS},
+}
+MODES = ("headless", "render")
+
+def max_population(scenario):
+    # None when the scenario takes any population.
+    spec = SCENARIOS[scenario]
+    if spec["queued"]:
+        return None
+    spans = [(HEIGHT if ON_Y_AXIS[DIR_CODE[d]] else WIDTH) + VEHICLE_HEIGHT for d in spec["directions"]]
+    return len(spec["directions"]) * 2 * int(min(spans) // spec["spacing"])
+
+def _populate(sim, population, directions, spacing, queued):
+    store = sim.vehicles
+    per_lane = -(-population // (len(directions) * 2))
+    for i in range(population):
+        direction = directions[i % len(directions)]
+        k = i // (len(directions) * 2)
+        v = sim.spawn(direction, lane=1 + (i // len(directions)) % 2)
+        d = DIR_CODE[direction]
+        if queued:
+            span = float(store.distance_to_stop_line()[v.slot])
+            gap = min(spacing, span / per_lane)
+            advance = span - k * gap
+        else:
+            span = (HEIGHT if ON_Y_AXIS[d] else WIDTH) + float(v.height)
+            gap = min(spacing, span / per_lane)
+            advance = k * gap
+        if ON_Y_AXIS[d]:
+            v.y += TRAVEL_SIGN[d] * advance
+        else:
+            v.x += TRAVEL_SIGN[d] * advance
+
+def build_case(scenario, population, seed=0):
+    spec = SCENARIOS[scenario]
+    limit = max_population(scenario)
+    if limit is not None and population > limit:
+        raise ValueError(f"{scenario} holds at most {limit} vehicles at {spec['spacing']} px spacing")
+    sim = Simulation(is_smart_mode=spec["smart"], seed=seed, demand_directions=[], timing=spec["timing"])
+    state = {"next_emergency": spec["emergency_every"]}
+
+    def on_exit(direction, lane, is_emergency):
+        # Every vehicle that leaves comes back in at the start of its lane.
+        emergency = state["next_emergency"] is not None and sim.time >= state["next_emergency"]
+        if emergency:
+            state["next_emergency"] = sim.time + spec["emergency_every"]
+        sim.spawn(direction, emergency, lane=lane)
+
+    if spec["emergency_every"]:
+        # One emergency vehicle from the start, then one more every emergency_every seconds.
+        _populate(sim, population - 1, spec["directions"], spec["spacing"], spec["queued"])
+        sim.spawn(spec["directions"][0], True)
+    else:
+        _populate(sim, population, spec["directions"], spec["spacing"], spec["queued"])
+    sim.on_exit = on_exit
+    return sim
+
+def run_case(scenario, population, mode="headless", ticks=200, warmup=20, seed=0):
+    sim = build_case(scenario, population, seed)
+    renderer = draw_road_us = None
+    profiler = Profiler(window=ticks)
+    if mode == "render":
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        import pygame
+        from simulation.dashboard import Dashboard
+        from simulation.render import Renderer, draw_road
+        pygame.init()
+        screen = pygame.Surface((WIDTH, HEIGHT))
+        start = time.perf_counter()
+        draw_road(screen)
+        draw_road_us = (time.perf_counter() - start) * 1e6
+        dashboard = Dashboard(WIDTH, HEIGHT)
+        renderer = Renderer(screen, dashboard)
+        profiler.attach(dashboard, "draw", "dashboard")
+        profiler.attach(renderer, "draw", "render")
+    profiler.attach(sim, "_spawn_step", "spawn")
+    profiler.attach(sim.intersection_manager, "update", "signals")
+    profiler.attach(sim.vehicles, "step", "vehicles")
+    profiler.attach(sim.vehicles, "remove_out_of_bounds", "exits")
+    profiler.attach(sim.predictor, "observe", "predictor")
+    profiler.enable()
+
+    def one_tick():
+        sim.tick()
+        if renderer:
+            renderer.draw(sim, sim.predictor)
+
+    for _ in range(warmup):
+        one_tick()
+    profiler.reset()
+    start = time.perf_counter()
+    for _ in range(ticks):
+        one_tick()
+    elapsed = time.perf_counter() - start
+    components = {label: section.total / ticks * 1e6 for label, section in profiler.sections.items()}
+    p99 = {label: stats["p99_us"] for label, stats in profiler.stats().items()}
+    profiler.disable()
+
+    # Peak Python/NumPy allocation over a few more ticks, kept out of the timed loop
+    # because tracing slows every allocation down.
+    tracemalloc.start()
+    for _ in range(min(ticks, 20)):
+        one_tick()
+    peak_traced = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "scenario": scenario, "population": population, "mode": mode, "ticks": ticks,
+        "vehicles_live": sim.vehicles.count, "queued": int(sim.vehicles.counters.queued.sum()),
+        "ticks_per_sec": ticks / elapsed,
+        "us_per_tick": {"total": elapsed / ticks * 1e6, **components},
+        "p99_us_per_call": p99,
+        "draw_road_us": draw_road_us,
+        "peak_traced_kb": peak_traced / 1024,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+def run_realtime(seconds=600, warmup=60, seed=0):
+    sim = Simulation(seed=seed)
+    sim.run(warmup)
+    ticks = int(round(seconds / sim.dt))
+    start = time.perf_counter()
+    sim.step(ticks)
+    elapsed = time.perf_counter() - start
+    return {"seconds": seconds, "ticks": ticks, "vehicles_live": sim.vehicles.count,
+            "realtime_factor": seconds / elapsed, "us_per_tick": elapsed / ticks * 1e6}
+
+def _run_task(task):
+    return run_case(*task)
+
+def run_suite(scenarios=tuple(SCENARIOS), populations=None, modes=MODES, ticks=200, warmup=20, seed=0,
+              realtime_seconds=600):
+    # populations=None runs each scenario at its own populations.
+    tasks = [(s, p, m, ticks, warmup, seed) for s in scenarios for p in populations or SCENARIOS[s]["populations"]
+             for m in modes if max_population(s) is None or p <= max_population(s)]
+    # One case per child process, one at a time, so cases neither share memory nor CPU.
+    with mp.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        results = []
+        for result in pool.imap(_run_task, tasks):
+            results.append(result)
+            print(f"{result['scenario']:>10} {result['population']:>6} {result['mode']:>8}  "
+                  f"{result['ticks_per_sec']:9.1f} ticks/s  "
+                  + "  ".join(f"{k}={v:.0f}us" for k, v in result["us_per_tick"].items())
+                  + f"  peak={result['peak_traced_kb']:.0f}KiB rss={result['peak_rss_kb']}KiB", flush=True)
+        realtime = pool.apply(run_realtime, (realtime_seconds, 60, seed))
+        print(f"  realtime {realtime['vehicles_live']:>6} headless  {realtime['realtime_factor']:9.1f}x real time  "
+              f"total={realtime['us_per_tick']:.0f}us", flush=True)
+    return {
+        "meta": {"python": platform.python_version(), "numpy": np.__version__,
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "ticks": ticks, "seed": seed},
+        "results": results,
+        "realtime": realtime,
+    }
+
+def compare(baseline, current, tolerance=0.25):
+    # A case regresses when its throughput drops by more than `tolerance`.
+    base = {(r["scenario"], r["population"], r["mode"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        old = base.get((r["scenario"], r["population"], r["mode"]))
+        if old and r["ticks_per_sec"] < old["ticks_per_sec"] * (1 - tolerance):
+            regressions.append((r["scenario"], r["population"], r["mode"], old["ticks_per_sec"], r["ticks_per_sec"]))
+    old, new = baseline.get("realtime"), current["realtime"]
+    if old and new["realtime_factor"] < old["realtime_factor"] * (1 - tolerance):
+        regressions.append(("realtime", new["vehicles_live"], "headless", old["realtime_factor"], new["realtime_factor"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Tick throughput benchmarks")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--populations", nargs="+", type=int, default=None,
+                        help="populations for every scenario (default: each scenario's own)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to check for throughput regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--realtime-seconds", type=float, default=600)
+    parser.add_argument("--min-realtime", type=float, default=None,
+                        help="fail if the realtime case runs slower than this many times real time")
+    args = parser.parse_args()
+
+    results = run_suite(args.scenarios, args.populations, args.modes, args.ticks, args.warmup, args.seed,
+                        args.realtime_seconds)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for scenario, population, mode, old, new in regressions:
+            print(f"REGRESSION {scenario}/{population}/{mode}: {old:.1f} -> {new:.1f} ticks/s")
+        if regressions:
+            sys.exit(1)
+    if args.min_realtime is not None and results["realtime"]["realtime_factor"] < args.min_realtime:
+        print(f"REGRESSION realtime: {results['realtime']['realtime_factor']:.1f}x real time, "
+              f"below --min-realtime {args.min_realtime:g}x")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,19 @@
 # config.py
+import os
+
 WIDTH = 800
 HEIGHT = 740
-FPS = 60
+FPS = 60 # Render rate
+TICK_RATE = 60 # Simulation ticks per second, independent of the render rate (Simulation(dt=...) for finer steps)
 
-# Vehicle settings
+# Vehicle settings (speeds in px/s, accelerations in px/s^2)
 VEHICLE_WIDTH = 20
 VEHICLE_HEIGHT = 40
-BASE_SPEED = 2.5
-MIN_SPEED = 0.8
+BASE_SPEED = 150.0 # 2.5 px per frame at 60 FPS
+MIN_SPEED = 48.0
+ACCELERATION = 720.0
+DECELERATION = 720.0
+STOP_LINE_TOLERANCE = 5 # px either side of the stop line that counts as "at" it
 
 # Intersection settings
 STOP_OFFSET = 70
@@ -19,3 +25,12 @@ GREEN_DURATION = 8
 YELLOW_DURATION = 2
 MIN_GREEN = 4
 MAX_GREEN = 15
+
+# Live state streaming (simulation/stream.py); None leaves a listener off
+STREAM_PORT = None # e.g. 8765 for length-prefixed TCP frames
+STREAM_WS_PORT = None # e.g. 8766 for WebSocket viewers
+STREAM_RATE = 20 # frames per simulated second
+
+# Demand profile for the windowed app (simulation/demand.py); None spawns from
+# the fixed rush-hour pool every 0.8 s (smart) or 0.4 s (fixed) instead
+DEMAND_PROFILE = os.path.join(os.path.dirname(__file__), "data.json")
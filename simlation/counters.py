@@ -0,0 +1,60 @@
+# simulation/counters.py
+import numpy as np
+
+from simulation.vehicle import DIRECTIONS
+
+DIR_INDEX = {d: i for i, d in enumerate(DIRECTIONS)}
+
+# Running totals kept up to date by VehicleStore as vehicles change state,
+# so the controller and dashboard read counts instead of sweeping every vehicle.
+#   waiting:  stopped before the stop line (what the controller adapts green time to)
+#   queued:   stopped anywhere (what the dashboard shows)
+#   arrived / crossed: cumulative spawns and stop line crossings (what the predictor learns from)
+class TrafficCounters:
+    def __init__(self):
+        self.total = 0
+        self.waiting = np.zeros(len(DIRECTIONS), dtype=np.int64)
+        self.queued = np.zeros(len(DIRECTIONS), dtype=np.int64)
+        self.arrived = np.zeros(len(DIRECTIONS), dtype=np.int64)
+        self.crossed = np.zeros(len(DIRECTIONS), dtype=np.int64)
+        self.emergencies_present = 0
+        self.active_emergencies = {}  # vehicle id -> direction code, oldest first
+
+    def waiting_in(self, directions):
+        return int(sum(self.waiting[DIR_INDEX[d]] for d in directions))
+
+    def queued_in(self, directions):
+        return int(sum(self.queued[DIR_INDEX[d]] for d in directions))
+
+    def first_emergency_direction(self):
+        for direction_code in self.active_emergencies.values():
+            return DIRECTIONS[direction_code]
+        return None
+
+    def vehicle_added(self, vehicle_id, direction_code, is_emergency):
+        self.total += 1
+        self.arrived[direction_code] += 1
+        if is_emergency:
+            self.emergencies_present += 1
+            self.active_emergencies[vehicle_id] = direction_code
+
+    def vehicle_removed(self, vehicle_id, direction_code, is_emergency, is_queued, is_waiting):
+        self.total -= 1
+        self.queued[direction_code] -= is_queued
+        self.waiting[direction_code] -= is_waiting
+        if is_emergency:
+            self.emergencies_present -= 1
+            self.active_emergencies.pop(vehicle_id, None)
+
+    def vehicles_crossed(self, direction_codes):
+        self.crossed += np.bincount(direction_codes, minlength=len(DIRECTIONS))
+
+    def emergency_crossed(self, vehicle_id):
+        self.active_emergencies.pop(vehicle_id, None)
+
+    def apply_changes(self, counter, directions, old, new):
+        # Add +1/-1 per direction only for the vehicles whose flag flipped this tick.
+        changed = old != new
+        if changed.any():
+            delta = np.where(new[changed], 1, -1)
+            counter += np.bincount(directions[changed], weights=delta, minlength=len(DIRECTIONS)).astype(np.int64)
@@ -2,39 +2,67 @@
 import pygame
 import time
 
+from simulation.render import glyphs
+
 class Dashboard:
     HEIGHT = 140
+    FONT = ("Arial", 18, True)
+    TITLE_FONT = ("Arial", 22, True)
+    PROFILE_FONT = ("Courier New", 14, False)
 
     def __init__(self, width, height):
         self.width = width
         self.sim_height = height - self.HEIGHT
         if not pygame.font.get_init():
             pygame.font.init()
-        self.font = pygame.font.SysFont("Arial", 18, bold=True)
-        self.title_font = pygame.font.SysFont("Arial", 22, bold=True)
         self.last_flash = 0
         self.flash_on = True
+        self.last_key = None
+        self.profile_panel = None
+        self.profile_drawn = 0
+
+    def _text(self, screen, text, font, color, pos):
+        screen.blit(glyphs.render(text, font, color), pos)
 
     def draw_light_status(self, screen, light, x, y):
         color_map = {"green": (0, 200, 0), "yellow": (255, 255, 0), "red": (200, 0, 0)}
         color = color_map[light.state]
         time_str = f"({light.remaining_time}s)" if light.remaining_time > 0 else ""
         txt = f"{light.direction}: {light.state.upper()} {time_str}"
-        surf = self.font.render(txt, True, color)
-        screen.blit(surf, (x, y))
+        self._text(screen, txt, self.FONT, color, (x, y))
+
+    def _alert_visible(self, counters):
+        if not counters.emergencies_present:
+            return False
+        now = time.time()
+        if now - self.last_flash > 0.4:
+            self.flash_on = not self.flash_on
+            self.last_flash = now
+        return self.flash_on
 
     # --- UPDATED: Draw method now accepts and displays the current mode ---
-    def draw(self, screen, vehicles, lights, predictor, is_smart_mode):
+    # With only_if_changed the panel is skipped (returns None) when nothing on it changed.
+    def draw(self, screen, counters, lights, predictor, is_smart_mode, only_if_changed=False):
         panel_y = self.sim_height
-        pygame.draw.rect(screen, (30, 30, 30), (0, panel_y, self.width, self.HEIGHT))
-        title = self.title_font.render("Simulation Dashboard", True, (240, 240, 240))
-        screen.blit(title, (10, panel_y + 10))
-
         primary_lights = []
         for d in ["N", "S", "E", "W"]:
             light = next((l for l in lights if l.direction == d and l.lane == 1), None)
             if light:
                 primary_lights.append(light)
+        total_vehicles = counters.total
+        q_ns = counters.queued_in(("N", "S"))
+        q_ew = counters.queued_in(("E", "W"))
+        show_alert = self._alert_visible(counters)
+
+        key = (tuple((l.state, l.remaining_time) for l in primary_lights), total_vehicles, q_ns, q_ew,
+               is_smart_mode, predictor.current_green_duration, show_alert)
+        if only_if_changed and key == self.last_key:
+            return None
+        self.last_key = key
+
+        panel = pygame.draw.rect(screen, (30, 30, 30), (0, panel_y, self.width, self.HEIGHT))
+        self._text(screen, "Simulation Dashboard", self.TITLE_FONT, (240, 240, 240), (10, panel_y + 10))
+
         lx, ly = 20, panel_y + 50
         for i, light in enumerate(primary_lights):
             col = i // 2
@@ -42,15 +70,9 @@ class Dashboard:
             self.draw_light_status(screen, light, lx + col * 180, ly + row * 35)
 
         start_x = 400
-        total_vehicles = len(vehicles)
-        q_ns = sum(1 for v in vehicles if v.direction in ("N", "S") and v.speed == 0)
-        q_ew = sum(1 for v in vehicles if v.direction in ("E", "W") and v.speed == 0)
-        txt = self.font.render(f"Total Vehicles: {total_vehicles}", True, (230,230,230))
-        screen.blit(txt, (start_x, panel_y + 40))
-        q_txt = self.font.render(f"Queued N/S: {q_ns}", True, (230,230,230))
-        screen.blit(q_txt, (start_x, panel_y + 65))
-        q_txt_ew = self.font.render(f"Queued E/W: {q_ew}", True, (230,230,230))
-        screen.blit(q_txt_ew, (start_x, panel_y + 90))
+        self._text(screen, f"Total Vehicles: {total_vehicles}", self.FONT, (230,230,230), (start_x, panel_y + 40))
+        self._text(screen, f"Queued N/S: {q_ns}", self.FONT, (230,230,230), (start_x, panel_y + 65))
+        self._text(screen, f"Queued E/W: {q_ew}", self.FONT, (230,230,230), (start_x, panel_y + 90))
 
         # --- NEW: Display the current operational mode ---
         if is_smart_mode:
@@ -60,17 +82,26 @@ class Dashboard:
             mode_text = "MODE: STANDARD (FIXED TIMER)"
             mode_color = (255, 100, 100)
         
-        mode_surf = self.font.render(mode_text, True, mode_color)
-        screen.blit(mode_surf, (560, panel_y + 15))
+        self._text(screen, mode_text, self.FONT, mode_color, (560, panel_y + 15))
         
-        green_txt = self.font.render(f"Green Time: {predictor.current_green_duration}s", True, (0, 255, 0))
-        screen.blit(green_txt, (620, panel_y + 40))
+        self._text(screen, f"Green Time: {predictor.current_green_duration}s", self.FONT, (0, 255, 0), (620, panel_y + 40))
+
+        if show_alert:
+            self._text(screen, "🚨 EMERGENCY 🚨", self.TITLE_FONT, (255, 80, 80), (620, panel_y + 80))
+
+        return panel
 
-        if any(v.is_emergency for v in vehicles):
-            now = time.time()
-            if now - self.last_flash > 0.4:
-                self.flash_on = not self.flash_on
-                self.last_flash = now
-            if self.flash_on:
-                alert = self.title_font.render("🚨 EMERGENCY 🚨", True, (255, 80, 80))
-                screen.blit(alert, (620, panel_y + 80))
\ No newline at end of file
+    # Profiler overlay: p50/p99 per section in ms, re-rendered at most every refresh seconds.
+    def draw_profile(self, screen, profiler, pos=(10, 10), refresh=0.5):
+        now = time.time()
+        if self.profile_panel is None or now - self.profile_drawn > refresh:
+            rows = [(label, s["p50_us"] / 1000, s["p99_us"] / 1000) for label, s in profiler.stats().items() if s["calls"]]
+            line_height = 18
+            panel = pygame.Surface((300, 28 + line_height * len(rows)))
+            panel.fill((20, 20, 20))
+            panel.blit(glyphs.render("section        p50 ms   p99 ms", self.PROFILE_FONT, (240, 240, 240)), (8, 6))
+            for i, (label, p50, p99) in enumerate(rows):
+                text = f"{label:<22}{p50:7.2f}{p99:9.2f}"
+                panel.blit(glyphs.render(text, self.PROFILE_FONT, (180, 220, 180)), (8, 26 + i * line_height))
+            self.profile_panel, self.profile_drawn = panel, now
+        return screen.blit(self.profile_panel, pos)
\ No newline at end of file
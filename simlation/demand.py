@@ -0,0 +1,186 @@
+# simulation/demand.py
+# Time-varying demand. A DemandProfile gives, per origin, a flow in vehicles
+# per hour for each `bin_seconds` slice of the profile, and the share of those
+# vehicles using lane 1 (the road has no turning movements, so the lane is the
+# only choice a vehicle makes). The profile repeats, or holds its last bin.
+#
+# A DemandGenerator turns a profile into arrival times `horizon` seconds at a
+# time, in one vectorized batch per window. Headways are drawn in operational
+# time, where the cumulative flow grows by one per expected vehicle, and
+# mapped back through it to clock time: exponential headways give a Poisson
+# process at the profile's flows, and "empirical" headways (resampled from the
+# profile's list, rescaled to mean 1) keep their shape while following the
+# flows. Arrivals in the same lane are kept min_headway apart so vehicles never
+# enter on top of each other. Simulation releases them as its clock passes them.
+#
+# Profiles are JSON, on their own or under a "demand" key (see data.json):
+#   {"bin_seconds": 60, "repeat": true, "distribution": "poisson", "min_headway": 0.5,
+#    "flows": {"N": [600, 900, ...], ...}, "lane_shares": {"N": 0.5, ...}, "headways": [...]}
+import json
+import math
+
+import numpy as np
+
+from simulation.vehicle import DIRECTIONS
+
+class DemandProfile:
+    def __init__(self, bin_seconds, flows, lane_shares=None, repeat=True, distribution="poisson", headways=None,
+                 min_headway=0.5):
+        if distribution not in ("poisson", "empirical"):
+            raise ValueError(f"unknown headway distribution {distribution!r}")
+        if distribution == "empirical" and not headways:
+            raise ValueError("empirical headways need a non-empty headways list")
+        bins = max(len(flows.get(d, [])) for d in DIRECTIONS)
+        lane_shares = lane_shares or {}
+        self.bin_seconds = bin_seconds
+        self.repeat = repeat
+        self.distribution = distribution
+        self.min_headway = min_headway
+        self.headways = np.array(headways or [1.0], dtype=np.float64)
+        self.headways /= self.headways.mean()
+        # Per origin (N, S, E, W) and bin: vehicles per hour, arrivals per second and lane 1 share.
+        self.flows = np.zeros((4, bins))
+        self.lane_shares = np.full((4, bins), 0.5)
+        for i, d in enumerate(DIRECTIONS):
+            flow = flows.get(d, [])
+            self.flows[i, :len(flow)] = flow
+            self.lane_shares[i] = np.broadcast_to(lane_shares.get(d, 0.5), bins)
+        self.rates = self.flows / 3600.0
+        self.period = bins * bin_seconds
+        self.edges = np.arange(bins + 1) * bin_seconds
+        # Cumulative expected arrivals at each bin edge, per origin.
+        self.cumulative = np.concatenate([np.zeros((4, 1)), np.cumsum(self.rates * bin_seconds, axis=1)], axis=1)
+        self.totals = self.cumulative[:, -1]
+        if repeat:
+            self.end = math.inf if self.totals.any() else 0.0
+        else:
+            self.end = math.inf if self.rates[:, -1].any() else self.period
+
+    def operational_time(self, i, t):
+        # Expected arrivals from origin i up to clock time t.
+        if self.repeat:
+            k = np.floor(t / self.period)
+            return k * self.totals[i] + np.interp(t - k * self.period, self.edges, self.cumulative[i])
+        tail = np.maximum(t - self.period, 0.0) * self.rates[i, -1]
+        return np.interp(np.minimum(t, self.period), self.edges, self.cumulative[i]) + tail
+
+    def clock_time(self, i, u):
+        # Inverse of operational_time; u must lie where origin i has demand.
+        cumulative, rates = self.cumulative[i], self.rates[i]
+        if self.repeat:
+            k = np.floor(u / self.totals[i])
+            r = u - k * self.totals[i]
+            offset = k * self.period
+        else:
+            r = np.minimum(u, self.totals[i])
+            offset = np.maximum(u - self.totals[i], 0.0) / np.maximum(rates[-1], 1e-300)
+        # The last edge at or below r starts a bin with demand, unless r is past the end.
+        j = np.minimum(np.searchsorted(cumulative, r, side="right") - 1, len(rates) - 1)
+        return offset + self.edges[j] + (r - cumulative[j]) / np.maximum(rates[j], 1e-300)
+
+    def bin_of(self, t):
+        if self.repeat:
+            t = np.mod(t, self.period)
+        return np.minimum((t // self.bin_seconds).astype(np.int64), len(self.edges) - 2)
+
+def load_profile(path):
+    with open(path) as f:
+        data = json.load(f)
+    return DemandProfile(**data.get("demand", data))
+
+class DemandGenerator:
+    def __init__(self, profile, seed=None, horizon=60.0):
+        self.profile = profile
+        self.rng = np.random.default_rng(seed)
+        self.horizon = horizon
+        self.window_end = None
+        self.cursor = [None] * 4 # operational time of each origin's next arrival
+        self.lane_last = np.full(8, -math.inf) # latest arrival per (origin, lane)
+        self.times = np.zeros(0)
+        self.origins = np.zeros(0, dtype=np.int8)
+        self.lanes = np.zeros(0, dtype=np.int8)
+        self.next = 0
+        self.batches = 0
+        self.generated = 0
+
+    def _headways(self, n):
+        if self.profile.distribution == "poisson":
+            return self.rng.exponential(1.0, n)
+        return self.rng.choice(self.profile.headways, n)
+
+    def _arrivals(self, i, start, end):
+        # Operational times of origin i's arrivals in [start, end).
+        p = self.profile
+        if p.totals[i] == 0 and (p.repeat or p.rates[i, -1] == 0):
+            return np.zeros(0)
+        if self.cursor[i] is None:
+            self.cursor[i] = p.operational_time(i, start) + self._headways(1)[0]
+        target = p.operational_time(i, end)
+        chunks, u = [], self.cursor[i]
+        while u < target:
+            steps = np.cumsum(self._headways(int((target - u) * 1.1) + 16))
+            chunk = u + np.concatenate([[0.0], steps[:-1]])
+            chunks.append(chunk)
+            u = u + steps[-1]
+        arrivals = np.concatenate(chunks) if chunks else np.zeros(0)
+        inside = arrivals < target
+        self.cursor[i] = arrivals[~inside][0] if not inside.all() else u
+        return arrivals[inside]
+
+    def _extend(self):
+        p, h = self.profile, self.profile.min_headway
+        start, end = self.window_end, self.window_end + self.horizon
+        carried = len(self.times) - self.next
+        times, origins, lanes = [self.times[self.next:]], [self.origins[self.next:]], [self.lanes[self.next:]]
+        for i in range(4):
+            t = p.clock_time(i, self._arrivals(i, start, end))
+            lane = np.where(self.rng.random(len(t)) < p.lane_shares[i, p.bin_of(t)], 1, 2).astype(np.int8)
+            for l in (1, 2):
+                # Push arrivals back to keep min_headway per lane:
+                # t'[k] = max(t[k], t'[k-1] + h) = k*h + max over j <= k of (t[j] - j*h).
+                slot = i * 2 + l - 1
+                s = np.concatenate([[self.lane_last[slot]], t[lane == l]])
+                k = np.arange(len(s)) * h
+                s = k + np.maximum.accumulate(s - k)
+                self.lane_last[slot] = s[-1]
+                times.append(s[1:])
+                origins.append(np.full(len(s) - 1, i, dtype=np.int8))
+                lanes.append(np.full(len(s) - 1, l, dtype=np.int8))
+        self.times, self.origins, self.lanes = np.concatenate(times), np.concatenate(origins), np.concatenate(lanes)
+        order = np.argsort(self.times, kind="stable")
+        self.times, self.origins, self.lanes = self.times[order], self.origins[order], self.lanes[order]
+        self.generated += len(self.times) - carried
+        self.next = 0
+        self.window_end = end
+        self.batches += 1
+
+    def _cover(self, now, until):
+        # Generate windows until every arrival before `until` is known.
+        if self.window_end is None:
+            self.window_end = now
+        while self.window_end <= until and self.window_end < self.profile.end:
+            self._extend()
+
+    def next_time(self, now):
+        # Clock time of the next arrival at or after `now` is released (inf if none).
+        if self.window_end is None:
+            self.window_end = now
+        while True:
+            pending = self.times[self.next] if self.next < len(self.times) else math.inf
+            if pending < self.window_end or self.window_end >= self.profile.end:
+                return pending
+            self._extend()
+
+    def release(self, now, until):
+        # (direction, lane) of every arrival before `until`, in arrival order.
+        self._cover(now, until)
+        j = int(np.searchsorted(self.times, until, side="left"))
+        if j <= self.next:
+            return []
+        released = list(zip([DIRECTIONS[o] for o in self.origins[self.next:j].tolist()], self.lanes[self.next:j].tolist()))
+        self.next = j
+        return released
+
+    def stats(self):
+        return {"batches": self.batches, "generated": self.generated, "pending": len(self.times) - self.next,
+                "window_end": self.window_end}
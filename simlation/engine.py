@@ -0,0 +1,245 @@
+# simulation/engine.py
+import math
+import random
+import zlib
+
+import numpy as np
+
+from ai.traffic_predictor import TrafficPredictor
+from simulation.config import WIDTH, HEIGHT, TICK_RATE, LANE_WIDTH, STOP_OFFSET
+from simulation.vehicle_store import VehicleStore, DIR_CODE, LIGHT_CODE, LIGHT_GREEN, LIGHT_OFF, light_slot
+from simulation.traffic_light import TrafficLight
+from simulation.intersection import IntersectionManager
+from simulation.optimizer import SignalOptimizer
+from simulation.trace import TraceRecorder
+from simulation.events import EventScheduler
+from simulation.demand import DemandGenerator
+
+DIRECTIONS = ["N", "S", "E", "W"]
+RUSH_HOUR_DIRECTIONS = ["N", "N", "N", "S", "S", "S", "E", "W"]
+DESPAWN_MARGIN = 200
+MAX_CATCH_UP_TICKS = 25 # advance() runs at most this many ticks per call
+
+def create_lights():
+    lights = []
+    cx, cy = WIDTH // 2, HEIGHT // 2
+
+    def get_pos(direction, lane):
+        offset = (LANE_WIDTH * 0.5) if lane == 1 else (LANE_WIDTH * 1.5)
+        if direction == "N": return (cx + offset, cy - STOP_OFFSET + 15)
+        if direction == "S": return (cx - offset, cy + STOP_OFFSET - 15)
+        if direction == "E": return (cx + STOP_OFFSET - 15, cy - offset)
+        if direction == "W": return (cx - STOP_OFFSET + 15, cy + offset)
+
+    for direction in DIRECTIONS:
+        for lane in [1, 2]:
+            x, y = get_pos(direction, lane)
+            lights.append(TrafficLight(x, y, direction, lane))
+
+    return lights
+
+# Headless model: spawning, signal control and vehicle movement with no display.
+# The pygame window in main.py is only a viewer on top of this object.
+# demand_directions is the pool spawns are drawn from (empty: no own demand) and
+# spawn_interval a fixed gap between spawns (None keeps the per-mode default).
+# demand, a DemandProfile, replaces both with time-varying arrivals from a
+# DemandGenerator, starting at the simulation clock.
+# on_exit, if set, is called with (direction, lane, is_emergency) for every vehicle
+# that drives off the tile, which is how RoadNetwork hands it to the next junction.
+# timing overrides IntersectionManager's min_green/max_green/yellow/fixed durations.
+# lookahead switches smart mode to the look-ahead SignalOptimizer: True for its
+# defaults or a dict of SignalOptimizer options.
+# Every random draw comes from a stream derived from `seed` (a fresh one is picked
+# and kept in self.seed if none is given), so a run can be recorded and replayed.
+# Ticks are a fixed `dt` long; advance() turns wall-clock time into whole ticks so
+# the result of a run never depends on the frame rate it was watched at.
+class Simulation:
+    def __init__(self, is_smart_mode=True, dt=1.0 / TICK_RATE, seed=None, demand_directions=RUSH_HOUR_DIRECTIONS,
+                 on_exit=None, spawn_interval=None, timing=None, lookahead=None, demand=None):
+        self.dt = dt
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 62)
+        self.spawn_rng = random.Random(f"{self.seed}:spawn")
+        self.lane_rng = random.Random(f"{self.seed}:lane")
+        self.emergency_rng = random.Random(f"{self.seed}:emergency")
+        self.recorder = None
+        self.player = None
+        self.metrics = None
+        self.demand_directions = list(demand_directions)
+        self.spawn_interval = spawn_interval
+        self.demand = None
+        if demand:
+            self.demand = DemandGenerator(demand, seed=random.Random(f"{self.seed}:demand").getrandbits(64))
+        self.on_exit = on_exit
+        self.exited = 0
+        self.total_delay = 0.0
+        self.vehicles = VehicleStore()
+        self.lights = create_lights()
+        self.light_codes = np.full(8, LIGHT_OFF, dtype=np.int8)
+        self.predictor = TrafficPredictor()
+        self.optimizer = None
+        if lookahead:
+            self.optimizer = SignalOptimizer(self.vehicles, self.predictor, **(lookahead if isinstance(lookahead, dict) else {}))
+        self.intersection_manager = IntersectionManager(self.lights, self.vehicles.counters, predictor=self.predictor,
+                                                        optimizer=self.optimizer, **(timing or {}))
+        self.intersection_manager.on_phase_change = self._on_phase_change
+        self.is_smart_mode = is_smart_mode
+        self.spawn_timer = 0.0
+        self.accumulator = 0.0
+        self.time = 0.0
+        self.ticks = 0
+
+    def spawn(self, direction, is_emergency=False, lane=None):
+        if lane is None:
+            lane = self.lane_rng.choice([1, 2])
+        if self.recorder:
+            self.recorder.spawn(self.ticks, direction, lane, is_emergency)
+        return self.vehicles.add(direction, lane, is_emergency, self.time)
+
+    def spawn_emergency(self):
+        return self.spawn(self.emergency_rng.choice(DIRECTIONS), is_emergency=True)
+
+    def toggle_mode(self):
+        self.is_smart_mode = not self.is_smart_mode
+        if self.recorder:
+            self.recorder.mode(self.ticks, self.is_smart_mode)
+
+    # --- Record / replay (see simulation/trace.py) ---
+    def record(self, path, checkpoint_every=600):
+        self.recorder = TraceRecorder(self, path, checkpoint_every)
+
+    def stop_recording(self):
+        self.recorder.close(self)
+        self.recorder = None
+
+    def _on_phase_change(self, manager):
+        if self.recorder:
+            self.recorder.phase(self.ticks, manager)
+        elif self.player:
+            self.player.phase(self.ticks, manager)
+
+    def state_digest(self):
+        store, m = self.vehicles, self.intersection_manager
+        n = store.count
+        crc = 0
+        for arr in (store.ids, store.x, store.y, store.speed, store.crossed):
+            crc = zlib.crc32(arr[:n].tobytes(), crc)
+        signal = f"{m.phase}{m.active_group}{float(m.phase_timer)!r}{float(m.green_duration)!r}{m.preempted_for}{self.is_smart_mode}"
+        return zlib.crc32(signal.encode(), crc)
+
+    def _spawn_cooldown(self):
+        return self.spawn_interval or (0.8 if self.is_smart_mode else 0.4)
+
+    def _spawn_step(self, dt):
+        if self.demand:
+            for direction, lane in self.demand.release(self.time, self.time + dt):
+                self.spawn(direction, lane=lane)
+            return
+        spawn_cooldown = self._spawn_cooldown()
+        self.spawn_timer += dt
+        if self.spawn_timer > spawn_cooldown:
+            if self.demand_directions:
+                self.spawn(self.spawn_rng.choice(self.demand_directions))
+            self.spawn_timer -= spawn_cooldown # keep the overshoot so spacing does not depend on dt
+
+    def _update_light_codes(self):
+        for light in self.lights:
+            self.light_codes[light_slot(DIR_CODE[light.direction], light.lane)] = LIGHT_CODE[light.state]
+
+    def _move_step(self, dt):
+        self._update_light_codes()
+        self.vehicles.step(self.light_codes, dt, self.time)
+        exits = self.vehicles.remove_out_of_bounds(DESPAWN_MARGIN)
+        if len(exits):
+            self.exited += len(exits)
+            self.total_delay += float(exits["delay"].sum())
+            if self.metrics:
+                self.metrics.vehicles_exited(exits, self.time + dt)
+            if self.on_exit:
+                for e in exits:
+                    self.on_exit(DIRECTIONS[e["direction"]], int(e["lane"]), bool(e["emergency"]))
+
+    def tick(self, dt=None):
+        if self.player:
+            dt = self.player.begin_tick(self)
+        else:
+            dt = self.dt if dt is None else dt
+            if self.recorder:
+                self.recorder.begin_tick(self, dt)
+            self._spawn_step(dt)
+        self.intersection_manager.update(dt, self.is_smart_mode)
+        self._move_step(dt)
+        self.predictor.observe(self.vehicles.counters, self.light_codes[::2] == LIGHT_GREEN, dt)
+        self.time += dt
+        self.ticks += 1
+        if self.metrics:
+            self.metrics.sample(self)
+
+    def advance(self, elapsed):
+        # Runs every whole tick that fits in the wall-clock time since the last call,
+        # carrying the remainder over, and returns how far into the next tick we are
+        # (0..1) for interpolated drawing. If the machine falls behind, the backlog is
+        # dropped: the simulation runs slower than real time, but still tick for tick.
+        self.accumulator = min(self.accumulator + elapsed, self.dt * MAX_CATCH_UP_TICKS)
+        while self.accumulator >= self.dt:
+            self.tick()
+            self.accumulator -= self.dt
+        return self.accumulator / self.dt
+
+    # --- Fast-forward (see simulation/events.py) ---
+    def _time_to_spawn(self):
+        if self.demand:
+            return self.demand.next_time(self.time) - self.time
+        if not self.demand_directions:
+            return math.inf
+        return self._spawn_cooldown() - self.spawn_timer
+
+    def quiet_ticks(self):
+        # Whole ticks ahead in which the only change would be vehicles cruising or waiting.
+        if self.recorder or self.player:
+            return 0
+        self._update_light_codes()
+        t = min(self._time_to_spawn(), self.intersection_manager.time_to_next_change(self.is_smart_mode),
+                self.vehicles.quiet_time(self.light_codes, self.dt, DESPAWN_MARGIN))
+        if t == math.inf:
+            return 2 ** 31
+        return max(0, int(t / self.dt - 1e-6))
+
+    def skip(self, n):
+        # n ticks in one step; only valid for n <= quiet_ticks().
+        dt = self.dt
+        manager = self.intersection_manager
+        # The clocks are summed tick by tick so they round exactly as n ticks would and
+        # the next phase change or spawn lands on the same tick.
+        # With metrics on, the clock after each tick is kept so every skipped tick gets its row.
+        times = [] if self.metrics else None
+        for _ in range(n - 1):
+            self.spawn_timer += dt
+            manager.phase_timer += dt
+            self.time += dt
+            if times is not None:
+                times.append(self.time)
+        self.spawn_timer += dt
+        if not self.demand_directions:
+            self.spawn_timer %= self._spawn_cooldown()
+        manager.update(dt, self.is_smart_mode)
+        self._update_light_codes()
+        self.vehicles.cruise(n, dt)
+        self.predictor.observe(self.vehicles.counters, self.light_codes[::2] == LIGHT_GREEN, dt, n)
+        self.time += dt
+        self.ticks += n
+        if self.metrics:
+            times.append(self.time)
+            self.metrics.sample_span(self, times)
+
+    def fast_forward(self, seconds, scheduler=None):
+        # Runs `seconds` of simulated time, skipping over quiet stretches. Pass an
+        # EventScheduler to have its scheduled actions applied on the way.
+        scheduler = scheduler or EventScheduler(self)
+        return scheduler.run_until(self.time + seconds)
+
+    def step(self, n=1):
+        for _ in range(n):
+            self.tick()
+
+    def run(self, seconds):
+        self.step(int(round(seconds / self.dt)))
@@ -1,14 +1,26 @@
 # simulation/intersection.py
+import math
+
 from simulation.config import YELLOW_DURATION, MIN_GREEN, MAX_GREEN, FIXED_GREEN_DURATION
 
 class IntersectionManager:
-    def __init__(self, lights):
+    def __init__(self, lights, counters, min_green=MIN_GREEN, max_green=MAX_GREEN,
+                 yellow_duration=YELLOW_DURATION, fixed_green_duration=FIXED_GREEN_DURATION, predictor=None,
+                 optimizer=None):
         self.lights = lights
+        self.counters = counters
+        self.predictor = predictor # Sets green time from forecast demand when given
+        self.optimizer = optimizer # Extends each green step by step instead, when given
+        self.min_green = min_green
+        self.max_green = max_green
+        self.fixed_green_duration = fixed_green_duration
         self.active_group = ("N", "S")
         self.phase = "green"
         self.phase_timer = 0.0
-        self.green_duration = FIXED_GREEN_DURATION # Start with a default
-        self.yellow_duration = YELLOW_DURATION
+        self.green_duration = fixed_green_duration # Start with a default
+        self.yellow_duration = yellow_duration
+        self.preempted_for = None
+        self.on_phase_change = None # Called with the manager whenever the signal plan changes
 
         self._set_initial_light_states()
 
@@ -29,48 +41,86 @@ class IntersectionManager:
         duration = self.green_duration if self.phase == "green" else self.yellow_duration
         return max(0, int(duration - self.phase_timer))
     
-    def _count_waiting(self, vehicles, directions):
-        return sum(1 for v in vehicles if v.direction in directions and v.speed == 0 and v._is_before_stop_line())
+    def _count_waiting(self, directions):
+        return self.counters.waiting_in(directions)
+
+    def _notify(self):
+        if self.on_phase_change:
+            self.on_phase_change(self)
 
     # --- UPDATED: Main update method now handles both modes ---
-    def update(self, dt, vehicles, is_smart_mode):
+    def update(self, dt, is_smart_mode):
         self.phase_timer += dt
 
         # Smart Mode Logic (Adaptive and Responsive)
         if is_smart_mode:
-            emergency_vehicle = next((v for v in vehicles if v.is_emergency and not v.has_crossed), None)
-            if emergency_vehicle:
-                self._handle_emergency(emergency_vehicle)
+            emergency_direction = self.counters.first_emergency_direction()
+            if emergency_direction != self.preempted_for:
+                self.preempted_for = emergency_direction
+                self._notify()
+            if emergency_direction:
+                self._handle_emergency(emergency_direction)
                 return
 
+            if (self.optimizer and self.phase == "green" and self.phase_timer >= self.green_duration
+                    and self.green_duration < self.max_green):
+                self.green_duration = min(self.max_green, self.green_duration + self.optimizer.decide(self))
             if self.phase == "green" and self.phase_timer >= self.green_duration:
                 self.phase = "yellow"
                 self.phase_timer = 0
+                self._notify()
             elif self.phase == "yellow" and self.phase_timer >= self.yellow_duration:
                 self.phase = "green"
                 self.phase_timer = 0
                 self.active_group = ("E", "W") if self.active_group == ("N", "S") else ("N", "S")
-                self._adapt_green_duration(vehicles)
+                self._adapt_green_duration()
+                self._notify()
         
         # Standard Mode Logic (Fixed Timer)
         else:
-            self.green_duration = FIXED_GREEN_DURATION # Always use the fixed time
+            self.preempted_for = None
+            self.green_duration = self.fixed_green_duration # Always use the fixed time
             if self.phase == "green" and self.phase_timer >= self.green_duration:
                 self.phase = "yellow"
                 self.phase_timer = 0
+                self._notify()
             elif self.phase == "yellow" and self.phase_timer >= self.yellow_duration:
                 self.phase = "green"
                 self.phase_timer = 0
                 self.active_group = ("E", "W") if self.active_group == ("N", "S") else ("N", "S")
+                self._notify()
         
         self._update_light_states()
 
-    def _adapt_green_duration(self, vehicles):
-        count = self._count_waiting(vehicles, self.active_group)
-        self.green_duration = min(MAX_GREEN, max(MIN_GREEN, 4 + count // 2))
+    # Seconds until update() would change any light, 0 if the next update does.
+    # Used to fast-forward over stretches where the signals are steady.
+    def time_to_next_change(self, is_smart_mode):
+        if is_smart_mode:
+            emergency_direction = self.counters.first_emergency_direction()
+            if emergency_direction != self.preempted_for:
+                return 0.0
+            if emergency_direction:
+                return math.inf # held until the emergency vehicle crosses
+            duration = self.green_duration if self.phase == "green" else self.yellow_duration
+        else:
+            if self.preempted_for:
+                return 0.0
+            duration = self.fixed_green_duration if self.phase == "green" else self.yellow_duration
+        return duration - self.phase_timer
+
+    def _adapt_green_duration(self):
+        if self.optimizer:
+            self.green_duration = self.min_green
+            return
+        if self.predictor:
+            self.green_duration = self.predictor.green_time(self.active_group, self.counters.waiting,
+                                                            self.min_green, self.max_green)
+            return
+        count = self._count_waiting(self.active_group)
+        self.green_duration = min(self.max_green, max(self.min_green, 4 + count // 2))
 
-    def _handle_emergency(self, vehicle):
+    def _handle_emergency(self, direction):
         for light in self.lights:
-            light.state = "green" if light.direction == vehicle.direction else "red"
+            light.state = "green" if light.direction == direction else "red"
             light.remaining_time = 0
         self.phase_timer = 0
\ No newline at end of file
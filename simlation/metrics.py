@@ -0,0 +1,170 @@
+# simulation/metrics.py
+# Streaming telemetry: per-vehicle records and per-tick intersection series go
+# into preallocated ring buffers; full buffers are handed to a background thread
+# that appends them column by column to a directory on disk:
+#
+#   <path>/schema.json              tables, columns, dtypes and row counts
+#   <path>/<table>/<column>.bin     raw little-endian values, one file per column
+#
+# Buffers are recycled through a small fixed pool, so memory stays flat however
+# long the run is; if the writer falls behind, the simulation waits for it.
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from simulation.vehicle_store import EXIT_DTYPE
+from simulation.trace import PHASE_CODE, GROUP_CODE, DIR_CODE
+
+VEHICLE_DTYPE = np.dtype(EXIT_DTYPE.descr + [("exit_time", np.float64)])
+TICK_DTYPE = np.dtype([
+    ("tick", np.int64), ("time", np.float64),
+    ("queued", np.int32, (4,)), ("waiting", np.int32, (4,)),
+    ("phase", np.int8), ("group", np.int8), ("green_duration", np.float64),
+])
+
+class RingBuffer:
+    def __init__(self, table, dtype, capacity, pool_size, writer):
+        self.table = table
+        self.writer = writer
+        self.free = queue.Queue()
+        for _ in range(pool_size):
+            self.free.put(np.zeros(capacity, dtype=dtype))
+        self.buffer = self.free.get()
+        self.used = 0
+
+    def reserve(self):
+        # Returns the buffer and its first free index, swapping buffers when full.
+        if self.used == len(self.buffer):
+            self.flush()
+        return self.buffer, self.used
+
+    def commit(self, rows=1):
+        self.used += rows
+
+    def flush(self):
+        if self.used:
+            self.writer.submit(self.table, self.buffer, self.used, self.free)
+            self.buffer = self.free.get()
+            self.used = 0
+
+class ColumnarWriter(threading.Thread):
+    def __init__(self, path, tables):
+        super().__init__(daemon=True)
+        self.path = path
+        self.tables = tables
+        self.rows = {table: 0 for table in tables}
+        self.jobs = queue.Queue()
+        self.files = {}
+        for table, dtype in tables.items():
+            os.makedirs(os.path.join(path, table), exist_ok=True)
+            for name in dtype.names:
+                self.files[(table, name)] = open(os.path.join(path, table, name + ".bin"), "wb")
+        self.start()
+
+    def submit(self, table, buffer, rows, free):
+        self.jobs.put((table, buffer, rows, free))
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            table, buffer, rows, free = job
+            for name in buffer.dtype.names:
+                self.files[(table, name)].write(np.ascontiguousarray(buffer[name][:rows]).tobytes())
+            self.rows[table] += rows
+            free.put(buffer)
+
+    def close(self):
+        self.jobs.put(None)
+        self.join()
+        for f in self.files.values():
+            f.close()
+        schema = {table: {"rows": self.rows[table],
+                          "columns": [{"name": name, "dtype": dtype[name].base.str, "shape": list(dtype[name].shape)}
+                                      for name in dtype.names]}
+                  for table, dtype in self.tables.items()}
+        with open(os.path.join(self.path, "schema.json"), "w") as f:
+            json.dump(schema, f, indent=2)
+
+class MetricsRecorder:
+    def __init__(self, path, capacity=8192, pool_size=3, sample_every=1):
+        self.sample_every = sample_every
+        self.writer = ColumnarWriter(path, {"vehicles": VEHICLE_DTYPE, "ticks": TICK_DTYPE})
+        self.vehicles = RingBuffer("vehicles", VEHICLE_DTYPE, capacity, pool_size, self.writer)
+        self.ticks = RingBuffer("ticks", TICK_DTYPE, capacity, pool_size, self.writer)
+
+    def vehicles_exited(self, exits, now):
+        start = 0
+        while start < len(exits):
+            buf, i = self.vehicles.reserve()
+            take = min(len(exits) - start, len(buf) - i)
+            rows = buf[i:i + take]
+            for name in EXIT_DTYPE.names:
+                rows[name] = exits[name][start:start + take]
+            rows["exit_time"] = now
+            self.vehicles.commit(take)
+            start += take
+
+    def sample(self, sim):
+        if sim.ticks % self.sample_every:
+            return
+        buf, i = self.ticks.reserve()
+        row = buf[i]
+        row["tick"] = sim.ticks
+        row["time"] = sim.time
+        self._fill(row, sim)
+        self.ticks.commit()
+
+    def sample_span(self, sim, times):
+        # Rows for a fast-forwarded span ending at the current tick; `times` holds the
+        # clock after each of its ticks. Only the clock moves inside a quiet span, so
+        # every row repeats the current counters and signal state.
+        ticks = np.arange(sim.ticks - len(times) + 1, sim.ticks + 1)
+        keep = ticks % self.sample_every == 0
+        ticks, times = ticks[keep], np.asarray(times)[keep]
+        start = 0
+        while start < len(ticks):
+            buf, i = self.ticks.reserve()
+            take = min(len(ticks) - start, len(buf) - i)
+            rows = buf[i:i + take]
+            rows["tick"] = ticks[start:start + take]
+            rows["time"] = times[start:start + take]
+            self._fill(rows, sim)
+            self.ticks.commit(take)
+            start += take
+
+    def _fill(self, rows, sim):
+        manager, counters = sim.intersection_manager, sim.vehicles.counters
+        rows["queued"] = counters.queued
+        rows["waiting"] = counters.waiting
+        if manager.preempted_for:
+            rows["phase"], rows["group"] = PHASE_CODE["emergency"], DIR_CODE[manager.preempted_for]
+        else:
+            rows["phase"], rows["group"] = PHASE_CODE[manager.phase], GROUP_CODE[manager.active_group]
+        rows["green_duration"] = manager.green_duration
+
+    def close(self):
+        self.vehicles.flush()
+        self.ticks.flush()
+        self.writer.close()
+
+def load_metrics(path):
+    # Returns {table: {column: array}}; columns are memory-mapped, not read into RAM.
+    with open(os.path.join(path, "schema.json")) as f:
+        schema = json.load(f)
+    tables = {}
+    for table, spec in schema.items():
+        columns = {}
+        for col in spec["columns"]:
+            shape = (spec["rows"], *col["shape"])
+            file = os.path.join(path, table, col["name"] + ".bin")
+            if spec["rows"]:
+                columns[col["name"]] = np.memmap(file, dtype=col["dtype"], mode="r", shape=shape)
+            else:
+                columns[col["name"]] = np.zeros(shape, dtype=col["dtype"])
+        tables[table] = columns
+    return tables
@@ -0,0 +1,158 @@
+# simulation/network.py
+import multiprocessing as mp
+
+from simulation.config import TICK_RATE
+from simulation.engine import Simulation, RUSH_HOUR_DIRECTIONS
+
+# A road network is a grid of intersection tiles. Every tile is an ordinary
+# Simulation in its own local coordinates; a vehicle that drives off one tile
+# is handed to the approach of the same name on the neighbouring tile.
+# N traffic heads down the grid, S up, E left and W right.
+NEXT_TILE = {"N": (1, 0), "S": (-1, 0), "E": (0, -1), "W": (0, 1)}
+
+def edge_demand(rows, cols, row, col):
+    # External demand only enters on approaches that face the edge of the network.
+    faces_edge = {"N": row == 0, "S": row == rows - 1, "E": col == cols - 1, "W": col == 0}
+    return [d for d in RUSH_HOUR_DIRECTIONS if faces_edge[d]]
+
+def partition_tiles(rows, cols, workers):
+    # Contiguous row-major bands, so most hand-offs stay inside one region.
+    tiles = [(r, c) for r in range(rows) for c in range(cols)]
+    workers = max(1, min(workers, len(tiles)))
+    size, extra = divmod(len(tiles), workers)
+    regions, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        regions.append(tiles[start:end])
+        start = end
+    return regions
+
+# The tiles owned by one process. Hand-offs between its own tiles stay local;
+# hand-offs to tiles owned by other regions are returned from tick() for the
+# coordinator to deliver. Either way a vehicle that exits on tick t enters its
+# next tile at the start of tick t + 1, so results do not depend on the partition.
+class Region:
+    def __init__(self, rows, cols, tiles, seed=None, is_smart_mode=True, dt=1.0 / TICK_RATE):
+        self.rows, self.cols = rows, cols
+        self.sims = {}
+        self.pending = []
+        self.outbox = []
+        self.left_network = 0
+        for row, col in tiles:
+            tile_seed = None if seed is None else seed * 1000003 + row * cols + col
+            sim = Simulation(is_smart_mode, dt, seed=tile_seed, demand_directions=edge_demand(rows, cols, row, col))
+            sim.on_exit = self._exit_handler((row, col))
+            self.sims[(row, col)] = sim
+
+    def _exit_handler(self, tile):
+        def on_exit(direction, lane, is_emergency):
+            dr, dc = NEXT_TILE[direction]
+            dest = (tile[0] + dr, tile[1] + dc)
+            if dest in self.sims:
+                self.pending.append((dest, direction, lane, is_emergency))
+            elif 0 <= dest[0] < self.rows and 0 <= dest[1] < self.cols:
+                self.outbox.append((dest, direction, lane, is_emergency))
+            else:
+                self.left_network += 1
+        return on_exit
+
+    def tick(self, arrivals=()):
+        arrivals = self.pending + list(arrivals)
+        self.pending, self.outbox = [], []
+        for tile, direction, lane, is_emergency in arrivals:
+            self.sims[tile].spawn(direction, is_emergency, lane=lane)
+        for sim in self.sims.values():
+            sim.tick()
+        return self.outbox
+
+    def stats(self):
+        tiles = {}
+        for tile, sim in self.sims.items():
+            counters = sim.vehicles.counters
+            tiles[tile] = {"vehicles": counters.total, "queued": counters.queued.tolist(),
+                           "phase": sim.intersection_manager.phase,
+                           "active_group": sim.intersection_manager.active_group}
+        return {"tiles": tiles, "left_network": self.left_network, "in_transit": len(self.pending)}
+
+def _region_worker(conn, rows, cols, tiles, seed, is_smart_mode, dt):
+    region = Region(rows, cols, tiles, seed, is_smart_mode, dt)
+    while True:
+        command, payload = conn.recv()
+        if command == "tick":
+            conn.send(region.tick(payload))
+        elif command == "stats":
+            conn.send(region.stats())
+        elif command == "close":
+            break
+    conn.close()
+
+# Grid of rows x cols intersections split across `workers` processes by region.
+# Each step() is one tick everywhere followed by a boundary exchange of the
+# vehicles that crossed from one region into another.
+class RoadNetwork:
+    def __init__(self, rows, cols, workers=1, seed=None, is_smart_mode=True, dt=1.0 / TICK_RATE):
+        self.rows, self.cols = rows, cols
+        self.dt = dt
+        self.ticks = 0
+        self.regions = partition_tiles(rows, cols, workers)
+        self.owner = {tile: i for i, tiles in enumerate(self.regions) for tile in tiles}
+        self.inboxes = [[] for _ in self.regions]
+        self.local = None
+        self.conns, self.procs = [], []
+        if len(self.regions) == 1:
+            self.local = Region(rows, cols, self.regions[0], seed, is_smart_mode, dt)
+            return
+        for tiles in self.regions:
+            parent, child = mp.Pipe()
+            proc = mp.Process(target=_region_worker, args=(child, rows, cols, tiles, seed, is_smart_mode, dt), daemon=True)
+            proc.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(proc)
+
+    def _route(self, outbox):
+        for handoff in outbox:
+            self.inboxes[self.owner[handoff[0]]].append(handoff)
+
+    def step(self, n=1):
+        for _ in range(n):
+            inboxes, self.inboxes = self.inboxes, [[] for _ in self.regions]
+            if self.local is not None:
+                self._route(self.local.tick(inboxes[0]))
+            else:
+                for conn, inbox in zip(self.conns, inboxes):
+                    conn.send(("tick", inbox))
+                for conn in self.conns:
+                    self._route(conn.recv())
+            self.ticks += 1
+
+    def run(self, seconds):
+        self.step(int(round(seconds / self.dt)))
+
+    def stats(self):
+        if self.local is not None:
+            parts = [self.local.stats()]
+        else:
+            for conn in self.conns:
+                conn.send(("stats", None))
+            parts = [conn.recv() for conn in self.conns]
+        tiles = {}
+        for part in parts:
+            tiles.update(part["tiles"])
+        in_transit = sum(len(inbox) for inbox in self.inboxes) + sum(part["in_transit"] for part in parts)
+        return {"tiles": tiles, "vehicles": sum(t["vehicles"] for t in tiles.values()) + in_transit,
+                "left_network": sum(part["left_network"] for part in parts)}
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(("close", None))
+            conn.close()
+        for proc in self.procs:
+            proc.join()
+        self.conns, self.procs = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,29 @@
+# simulation/occupancy.py
+import numpy as np
+
+from simulation.vehicle import DIRECTIONS, PERPENDICULAR_DIRS
+
+# CONFLICTS[a, b] is True when a vehicle from approach a must yield to one from b inside the zone.
+CONFLICTS = np.array([[b in PERPENDICULAR_DIRS[a] for b in DIRECTIONS] for a in DIRECTIONS])
+
+# Occupancy index for one conflict zone (today the single intersection box).
+# Vehicles are counted per approach as they enter and leave, so "is any
+# conflicting traffic inside?" is a lookup, not a scan.
+class ConflictZone:
+    def __init__(self, left, top, right, bottom, conflicts=CONFLICTS):
+        self.left, self.top, self.right, self.bottom = left, top, right, bottom
+        self.conflicts = conflicts.astype(np.int64)
+        self.counts = np.zeros(len(DIRECTIONS), dtype=np.int64)
+
+    def contains(self, x, y, width, height):
+        return (x < self.right) & (x + width > self.left) & (y < self.bottom) & (y + height > self.top)
+
+    def enter(self, direction_code):
+        self.counts[direction_code] += 1
+
+    def leave(self, direction_code):
+        self.counts[direction_code] -= 1
+
+    def blocked_approaches(self):
+        # One flag per approach: True if any conflicting approach has a vehicle inside.
+        return (self.conflicts @ self.counts) > 0
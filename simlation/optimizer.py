@@ -0,0 +1,187 @@
+# simulation/optimizer.py
+# Look-ahead signal control. Instead of fixing the green time when a phase
+# starts, the active group gets min_green and then, each time its green runs
+# out, the optimizer decides whether to extend it or end it now.
+#
+# Each candidate plan ("hold the current green e more seconds, then carry on
+# with greens long enough to clear each group's queue") is scored by a rollout
+# of a fluid-queue copy of the intersection: every vehicle still before its
+# stop line becomes an arrival at the line (now if it is stopped, after its
+# free-flow travel time otherwise), forecast spawns are added at the
+# predictor's learned arrival rates, and each approach discharges at its
+# learned rate while green, after `lost_time` seconds of start-up loss
+# (vehicles here pull away almost at once, hence 0 by default). The rollout runs `cycles` signal cycles and the
+# plan with the least waiting per second wins; only its first `recheck`
+# seconds are committed before the next decision.
+#
+# Candidates are tried in max-pressure order (the group with more vehicles
+# waiting or about to arrive first), so if the per-decision `budget` (seconds
+# of wall-clock time, None for no limit) runs out the decision falls back to
+# max-pressure. Decisions are memoized on a coarse state: per approach, the
+# number of vehicles due at the stop line in each ETA_BUCKETS interval (the
+# rollout has each bucket's vehicles arrive at its BUCKET_ETA), plus the
+# active group and the quantized time it has been green. The learned rates
+# are not part of the key, as they drift every tick and no state would ever
+# recur; a cached decision keeps the rates it was rolled out with, so the
+# cache is part of the optimizer's state (see simulation/snapshot.py). A
+# budget cut depends on the machine, so runs that must replay exactly use
+# budget=None.
+import math
+from collections import OrderedDict
+from time import perf_counter
+
+import numpy as np
+
+from simulation.config import BASE_SPEED, STOP_LINE_TOLERANCE, STOP_OFFSET, WIDTH, HEIGHT
+from simulation.counters import DIR_INDEX
+
+GROUPS = (("N", "S"), ("E", "W"))
+RATE_STEP = 0.05 # learned rates are rounded to this many vehicles/s in the rollout
+# Upper edges (seconds) of the arrival-time buckets, and the time each bucket's
+# vehicles reach the stop line in the rollout; the last bucket takes everything
+# further out.
+ETA_BUCKETS = np.array([1.0, 3.0, 8.0])
+BUCKET_ETA = (0.0, 2.0, 5.5)
+# Free-flow seconds from the spawn point to the stop line, per approach (N, S, E, W).
+SPAWN_TO_LINE = np.array([HEIGHT // 2 - STOP_OFFSET] * 2 + [WIDTH // 2 - STOP_OFFSET] * 2) / BASE_SPEED
+
+class SignalOptimizer:
+    def __init__(self, vehicles, predictor, cycles=2, extensions=(0, 1, 2, 4, 8), recheck=1.0, lost_time=0.0,
+                 budget=0.004, quantum=0.5, cache_size=4096):
+        self.vehicles = vehicles
+        self.predictor = predictor
+        self.cycles = cycles
+        self.extensions = extensions
+        self.recheck = recheck
+        self.lost_time = lost_time
+        self.budget = budget
+        self.quantum = quantum
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.decisions = 0
+        self.cache_hits = 0
+        self.rollouts = 0
+        self.cutoffs = 0
+        self.max_decision_time = 0.0
+
+    def _state(self, manager):
+        # Per-approach counts of vehicles due at the stop line in each ETA bucket.
+        store, q = self.vehicles, self.quantum
+        n = store.count
+        dist = store.distance_to_stop_line()
+        before = ~store.crossed[:n] & (dist > -STOP_LINE_TOLERANCE)
+        eta = np.where(store.speed[:n] > 0, np.maximum(dist, 0.0) / BASE_SPEED, 0.0)
+        bucket = np.minimum(np.searchsorted(ETA_BUCKETS, eta[before], side="right"), len(ETA_BUCKETS) - 1)
+        counts = np.bincount(store.direction[:n][before].astype(np.int64) * len(ETA_BUCKETS) + bucket,
+                             minlength=4 * len(ETA_BUCKETS))
+        queues = tuple(tuple(row) for row in counts.reshape(4, len(ETA_BUCKETS)).tolist())
+        group = GROUPS.index(manager.active_group)
+        elapsed = int(manager.phase_timer / q)
+        return group, elapsed, queues
+
+    def _rates(self):
+        # Learned arrival and discharge rates per approach, in RATE_STEPs.
+        arrival = np.round(self.predictor.arrival_rate / RATE_STEP).astype(np.int64).tolist()
+        rate = np.round(self.predictor.discharge_rate / RATE_STEP).astype(np.int64).tolist()
+        return arrival, rate
+
+    def _arrivals(self, manager, state, arrival):
+        # Vehicles reaching the stop line per approach in each quantum of the longest
+        # plan: the known ones, plus forecast spawns once they have had time to drive in.
+        _, _, queues = state
+        q = self.quantum
+        steps = int((max(self.extensions) + self.cycles * 2 * (manager.max_green + manager.yellow_duration)) / q) + 1
+        arrivals = []
+        for i in range(4):
+            per_step = [arrival[i] * RATE_STEP * q if k * q >= SPAWN_TO_LINE[i] else 0.0 for k in range(steps)]
+            for eta, count in zip(BUCKET_ETA, queues[i]):
+                per_step[min(int(eta / q), steps - 1)] += count
+            arrivals.append(per_step)
+        return arrivals
+
+    def _rollout(self, manager, state, rate, arrivals, extension):
+        # Fluid queues stepped one quantum at a time under the plan "hold the current
+        # green `extension` more seconds, then alternate greens long enough to clear
+        # each group's queue", up to the start of the current group's green `cycles`
+        # cycles on. Returns vehicle-seconds of waiting per second over that span,
+        # counting what the vehicles still queued at the end are bound to wait.
+        self.rollouts += 1
+        group, elapsed, _ = state
+        q = self.quantum
+        lost = self.lost_time
+        yellow, min_green, max_green = manager.yellow_duration, manager.min_green, manager.max_green
+        rate = [max(r * RATE_STEP, RATE_STEP) for r in rate]
+        queue = [0.0] * 4
+        current = [DIR_INDEX[d] for d in GROUPS[group]]
+        green, served_from, phase_end, in_yellow = current, max(0.0, lost - elapsed * q), extension, False
+        cycles, cost, k = 0, 0.0, 0
+        while True:
+            t = k * q
+            if t >= phase_end:
+                if in_yellow:
+                    group = 1 - group
+                    green = [DIR_INDEX[d] for d in GROUPS[group]]
+                    if green == current:
+                        cycles += 1
+                        if cycles == self.cycles:
+                            break
+                    needed = lost + max(queue[i] / rate[i] for i in green)
+                    served_from, phase_end, in_yellow = t + lost, t + min(max_green, max(min_green, needed)), False
+                else:
+                    phase_end, in_yellow = t + yellow, True
+            for i in range(4):
+                waiting = queue[i] + arrivals[i][k]
+                if not in_yellow and t >= served_from and i in green:
+                    waiting = max(0.0, waiting - rate[i] * q)
+                queue[i] = waiting
+                cost += waiting * q
+            k += 1
+        # The current group is about to get its green and the other one has just lost it.
+        next_green = min(max_green, max(min_green, lost + max(queue[i] / rate[i] for i in current)))
+        for i in range(4):
+            until_green = lost if i in current else next_green + yellow + lost
+            cost += queue[i] * (until_green + queue[i] / (2 * rate[i]))
+        return cost / t
+
+    def _candidates(self, manager, state):
+        group, elapsed, queues = state
+        remaining = manager.max_green - elapsed * self.quantum
+        extensions = [e for e in self.extensions if e <= remaining] or [0]
+        # Max-pressure order: extending first if the active group has at least as
+        # many vehicles waiting or due within the next recheck as the other one.
+        pressure = [sum(count for d in g for eta, count in zip(BUCKET_ETA, queues[DIR_INDEX[d]]) if eta <= self.recheck)
+                    for g in GROUPS]
+        return sorted(extensions, reverse=pressure[group] >= pressure[1 - group])
+
+    def decide(self, manager):
+        # Seconds to extend the current green by; 0 ends it now.
+        start = perf_counter()
+        self.decisions += 1
+        state = self._state(manager)
+        best = self.cache.get(state)
+        if best is not None:
+            self.cache_hits += 1
+            self.cache.move_to_end(state)
+        else:
+            arrival, rate = self._rates()
+            arrivals = self._arrivals(manager, state, arrival)
+            best, best_cost, complete = None, math.inf, True
+            candidates = self._candidates(manager, state)
+            for extension in candidates:
+                cost = self._rollout(manager, state, rate, arrivals, extension)
+                if cost < best_cost:
+                    best, best_cost = extension, cost
+                if self.budget is not None and perf_counter() - start > self.budget and extension != candidates[-1]:
+                    self.cutoffs += 1
+                    complete = False
+                    break
+            if complete:
+                self.cache[state] = best
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        self.max_decision_time = max(self.max_decision_time, perf_counter() - start)
+        return min(best, self.recheck)
+
+    def stats(self):
+        return {"decisions": self.decisions, "cache_hits": self.cache_hits, "rollouts": self.rollouts,
+                "cutoffs": self.cutoffs, "cache_size": len(self.cache), "max_decision_ms": self.max_decision_time * 1e3}
@@ -0,0 +1,121 @@
+# simulation/profiler.py
+# Hot-path timing for the main loop. A Profiler is given (object, method)
+# pairs to watch; while enabled each one is shadowed by a timing wrapper set
+# as an instance attribute, and disabling removes the wrapper again (or puts
+# back the original, for functions that live on the object itself such as a
+# module's) so the original method is called directly, with no check left on
+# the hot path.
+# Each section keeps its last `window` durations for rolling p50/p99.
+import json
+import time
+from time import perf_counter
+
+import numpy as np
+
+_MISSING = object()
+
+class Section:
+    def __init__(self, window):
+        self.samples = np.zeros(window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.count += 1
+        self.total += seconds
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+
+    def stats(self):
+        if not self.count:
+            return {"calls": 0, "mean_us": 0.0, "p50_us": 0.0, "p99_us": 0.0, "max_us": 0.0}
+        recent = self.samples[:min(self.count, len(self.samples))] * 1e6
+        p50, p99 = np.percentile(recent, (50, 99))
+        return {"calls": self.count, "mean_us": self.total / self.count * 1e6,
+                "p50_us": float(p50), "p99_us": float(p99), "max_us": float(recent.max())}
+
+class Profiler:
+    def __init__(self, window=600, enabled=False):
+        self.window = window
+        self.enabled = False
+        self.targets = []
+        self.sections = {}
+        self.originals = {}
+        if enabled:
+            self.enable()
+
+    def attach(self, obj, name, label=None):
+        label = label or name
+        section = self.sections.setdefault(label, Section(self.window))
+        self.targets.append((obj, name, section))
+        if self.enabled:
+            self._install(obj, name, section)
+
+    def attach_simulation(self, sim):
+        # Top-level tick stages, then the signal and vehicle methods inside them.
+        self.attach(sim, "tick", "tick")
+        self.attach(sim, "_spawn_step", "spawn")
+        self.attach(sim.intersection_manager, "update", "signals")
+        self.attach(sim.intersection_manager, "_adapt_green_duration", "signals.adapt")
+        if sim.optimizer:
+            self.attach(sim.optimizer, "decide", "signals.lookahead")
+        self.attach(sim, "_move_step", "move")
+        self.attach(sim.vehicles, "step", "vehicles.step")
+        self.attach(sim.vehicles, "remove_out_of_bounds", "vehicles.exits")
+        self.attach(sim.predictor, "observe", "predictor")
+
+    def attach_renderer(self, renderer):
+        self.attach(renderer, "draw", "render")
+        self.attach(renderer.dashboard, "draw", "render.dashboard")
+
+    def _install(self, obj, name, section):
+        inner = getattr(obj, name)
+        add = section.add
+        # What disable() has to put back: the attribute itself when it lives on the
+        # object (modules, instance attributes), nothing when it comes from the class.
+        own = vars(obj).get(name, _MISSING) if hasattr(obj, "__dict__") else _MISSING
+        self.originals.setdefault((id(obj), name), own) # the first install sees the real one
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return inner(*args, **kwargs)
+            finally:
+                add(perf_counter() - start)
+        setattr(obj, name, timed)
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            for obj, name, section in self.targets:
+                self._install(obj, name, section)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            for obj, name, _ in self.targets:
+                if (id(obj), name) not in self.originals:
+                    continue # attached twice and already restored
+                original = self.originals.pop((id(obj), name))
+                if original is _MISSING:
+                    obj.__dict__.pop(name, None)
+                else:
+                    setattr(obj, name, original)
+
+    def toggle(self):
+        self.disable() if self.enabled else self.enable()
+        return self.enabled
+
+    def reset(self):
+        for section in self.sections.values():
+            section.reset()
+
+    def stats(self):
+        return {label: section.stats() for label, section in self.sections.items()}
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump({"time": time.time(), "window": self.window, "sections": self.stats()}, f, indent=2)
@@ -0,0 +1,135 @@
+# simulation/render.py
+from collections import OrderedDict
+
+import pygame
+
+from simulation.config import LANE_WIDTH, STOP_OFFSET
+
+_fonts = {}
+
+def get_font(name, size, bold=True):
+    key = (name, size, bold)
+    font = _fonts.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = _fonts[key] = pygame.font.SysFont(name, size, bold=bold)
+    return font
+
+# LRU cache of rendered text surfaces keyed by (string, font, colour).
+# Timers and counters only take a handful of distinct values, so almost every
+# frame is served from here instead of calling Font.render again.
+class GlyphCache:
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+
+    def render(self, text, font_key, color):
+        key = (text, font_key, color)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.surfaces.move_to_end(key)
+            return surf
+        surf = get_font(*font_key).render(text, True, color)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.maxsize:
+            self.surfaces.popitem(last=False)
+        return surf
+
+glyphs = GlyphCache()
+
+def draw_road(screen):
+    width, height = screen.get_size()
+    center_x, center_y = width // 2, height // 2
+    road_color = (60, 60, 60)
+    road_width = LANE_WIDTH * 4
+
+    pygame.draw.rect(screen, road_color, (0, center_y - road_width//2, width, road_width))
+    pygame.draw.rect(screen, road_color, (center_x - road_width//2, 0, road_width, height))
+    pygame.draw.line(screen, (255, 255, 0), (center_x, 0), (center_x, height), 3)
+    pygame.draw.line(screen, (255, 255, 0), (0, center_y), (width, center_y), 3)
+    dash_color = (200, 200, 200)
+    dash_length, gap = 20, 15
+    for y in range(0, height, dash_length + gap):
+        pygame.draw.line(screen, dash_color, (center_x - LANE_WIDTH, y), (center_x - LANE_WIDTH, y + dash_length), 1)
+        pygame.draw.line(screen, dash_color, (center_x + LANE_WIDTH, y), (center_x + LANE_WIDTH, y + dash_length), 1)
+    for x in range(0, width, dash_length + gap):
+        pygame.draw.line(screen, dash_color, (x, center_y - LANE_WIDTH), (x + dash_length, center_y - LANE_WIDTH), 1)
+        pygame.draw.line(screen, dash_color, (x, center_y + LANE_WIDTH), (x + dash_length, center_y + LANE_WIDTH), 1)
+
+    font_key = ("Arial", 40, True)
+    text_color = (220, 220, 220)
+    n_text = glyphs.render("N", font_key, text_color)
+    screen.blit(n_text, (center_x - LANE_WIDTH * 1.8, center_y + STOP_OFFSET + 5))
+    s_text = glyphs.render("S", font_key, text_color)
+    screen.blit(s_text, (center_x + LANE_WIDTH * 0.8, center_y - STOP_OFFSET - s_text.get_height()))
+    w_text = glyphs.render("W", font_key, text_color)
+    screen.blit(w_text, (center_x + STOP_OFFSET + 5, center_y - LANE_WIDTH * 1.8))
+    e_text = glyphs.render("E", font_key, text_color)
+    screen.blit(e_text, (center_x - STOP_OFFSET - e_text.get_width() - 5, center_y + LANE_WIDTH * 0.8))
+
+def build_background(size):
+    background = pygame.Surface(size)
+    background.fill((18, 18, 18))
+    draw_road(background)
+    return background
+
+# Draws the simulation over a pre-rendered road and returns only the rectangles
+# that changed, for pygame.display.update(). Vehicles are erased from the
+# background and redrawn each frame; lights and the dashboard are redrawn only
+# when their contents change or a vehicle has passed over them. With an enabled
+# profiler its overlay is drawn on top and erased again like a vehicle.
+class Renderer:
+    def __init__(self, screen, dashboard, profiler=None):
+        self.screen = screen
+        self.dashboard = dashboard
+        self.profiler = profiler
+        self.background = build_background(screen.get_size())
+        self.sim_area = pygame.Rect(0, 0, screen.get_width(), dashboard.sim_height)
+        self.vehicle_rects = []
+        self.overlay_rects = []
+        self.light_rects = []
+        self.light_keys = None
+        self.full_redraw = True
+
+    def _restore(self, rects):
+        for rect in rects:
+            self.screen.blit(self.background, rect, rect)
+
+    def draw(self, sim, predictor, alpha=1.0):
+        screen = self.screen
+        full = self.full_redraw
+        if full:
+            screen.blit(self.background, (0, 0))
+            self.vehicle_rects, self.overlay_rects, self.light_rects, self.light_keys = [], [], [], None
+
+        screen.set_clip(self.sim_area)
+        erased = self.vehicle_rects + self.overlay_rects
+        self._restore(erased)
+        dirty = list(erased)
+
+        light_keys = [(l.state, l.remaining_time) for l in sim.lights]
+        passed_over = any(r.collidelist(erased) != -1 for r in self.light_rects)
+        if light_keys != self.light_keys or passed_over:
+            self._restore(self.light_rects)
+            dirty += self.light_rects
+            self.light_rects = [l.draw(screen) for l in sim.lights]
+            dirty += self.light_rects
+            self.light_keys = light_keys
+
+        self.vehicle_rects = [v.draw(screen, alpha) for v in sim.vehicles]
+        dirty += self.vehicle_rects
+        self.overlay_rects = []
+        if self.profiler and self.profiler.enabled:
+            self.overlay_rects = [self.dashboard.draw_profile(screen, self.profiler)]
+            dirty += self.overlay_rects
+        screen.set_clip(None)
+
+        panel = self.dashboard.draw(screen, sim.vehicles.counters, sim.lights, predictor, sim.is_smart_mode, only_if_changed=not full)
+        if panel:
+            dirty.append(panel)
+
+        if full:
+            self.full_redraw = False
+            return [screen.get_rect()]
+        return dirty
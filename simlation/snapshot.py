@@ -0,0 +1,283 @@
+# simulation/snapshot.py
+# Full-state snapshots of a Simulation, so experiments can start from a
+# warmed-up road instead of an empty one.
+#
+# A snapshot is MAGIC followed by named arrays, each stored as
+#   name len u8 | name | dtype len u8 | dtype | ndim u8 | shape u32 * ndim | raw bytes
+# covering every vehicle field, the lane queues, counters, lights, signal
+# phase and timers, the learned demand model, the look-ahead optimizer's
+# options and memoized decisions, the three RNG streams and, for
+# profile-driven runs, the demand profile and its generator (RNG, cursors and
+# the arrivals already drawn but not yet released).
+# restore() builds a fresh Simulation from one; keyword arguments turn it into
+# a variant (another mode, demand, timing, seed...) that carries on from the
+# same state. A demand= variant, or a new seed, starts its arrivals afresh from
+# the restored clock, and a lookahead= variant starts with an empty cache. Snapshots are plain bytes, so they pickle cheaply to
+# worker processes. Recorders, players, metrics and on_exit are not part of
+# the state.
+#
+#   python -m simulation.snapshot --seconds 300 --out warm.snap
+#   python -m simulation.sweep --snapshot warm.snap --modes smart lookahead
+import argparse
+import math
+import struct
+
+import numpy as np
+
+from simulation.demand import DemandProfile
+from simulation.optimizer import ETA_BUCKETS
+from simulation.vehicle import DIRECTIONS, Vehicle
+from simulation.vehicle_store import LIGHT_CODE
+from simulation.trace import PHASE_CODE, GROUP_CODE, DIR_CODE
+
+MAGIC = b"SIMSNP01"
+LIGHT_STATES = {code: state for state, code in LIGHT_CODE.items()}
+PHASES = {code: phase for phase, code in PHASE_CODE.items()}
+GROUPS = {code: group for group, code in GROUP_CODE.items()}
+PREDICTOR_ARRAYS = ("arrival_rate", "discharge_rate", "queue_growth", "waiting", "last_arrived", "last_crossed")
+COUNTER_ARRAYS = ("waiting", "queued", "arrived", "crossed")
+RNGS = ("spawn_rng", "lane_rng", "emergency_rng")
+DISTRIBUTIONS = ("poisson", "empirical")
+U64 = (1 << 64) - 1
+
+def _pack(arrays):
+    out = bytearray(MAGIC)
+    for name, value in arrays.items():
+        value = np.asarray(value)
+        name, dtype = name.encode("ascii"), value.dtype.str.encode("ascii")
+        out += struct.pack(f"<B{len(name)}sB{len(dtype)}sB{value.ndim}I", len(name), name, len(dtype), dtype,
+                           value.ndim, *value.shape)
+        out += value.tobytes()
+    return bytes(out)
+
+def _unpack(data):
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a simulation snapshot")
+    arrays, pos = {}, len(MAGIC)
+    while pos < len(data):
+        n = data[pos]
+        name = data[pos + 1:pos + 1 + n].decode("ascii")
+        pos += 1 + n
+        n = data[pos]
+        dtype = np.dtype(data[pos + 1:pos + 1 + n].decode("ascii"))
+        pos += 1 + n
+        ndim = data[pos]
+        shape = struct.unpack_from(f"<{ndim}I", data, pos + 1)
+        pos += 1 + 4 * ndim
+        size = dtype.itemsize * math.prod(shape)
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=math.prod(shape), offset=pos).reshape(shape)
+        pos += size
+    return arrays
+
+def _demand_arrays(arrays, gen):
+    p = gen.profile
+    arrays["profile.params"] = np.array([p.bin_seconds, p.repeat, p.min_headway, DISTRIBUTIONS.index(p.distribution)])
+    arrays["profile.flows"] = p.flows
+    arrays["profile.lane_shares"] = p.lane_shares
+    arrays["profile.headways"] = p.headways
+    rng = gen.rng.bit_generator.state
+    state, inc = rng["state"]["state"], rng["state"]["inc"]
+    arrays["generator.rng"] = np.array([state >> 64, state & U64, inc >> 64, inc & U64, rng["has_uint32"],
+                                        rng["uinteger"]], dtype=np.uint64)
+    arrays["generator.cursor"] = np.array([math.nan if u is None else u for u in gen.cursor])
+    arrays["generator.lane_last"] = gen.lane_last
+    arrays["generator.window"] = np.array([gen.horizon, math.nan if gen.window_end is None else gen.window_end])
+    arrays["generator.counts"] = np.array([gen.batches, gen.generated], dtype=np.int64)
+    arrays["generator.times"] = gen.times[gen.next:]
+    arrays["generator.origins"] = gen.origins[gen.next:]
+    arrays["generator.lanes"] = gen.lanes[gen.next:]
+
+def _profile(a):
+    bin_seconds, repeat, min_headway, distribution = a["profile.params"].tolist()
+    profile = DemandProfile(bin_seconds, dict(zip(DIRECTIONS, a["profile.flows"].tolist())),
+                            lane_shares=dict(zip(DIRECTIONS, a["profile.lane_shares"])), repeat=bool(repeat),
+                            distribution=DISTRIBUTIONS[int(distribution)], headways=a["profile.headways"].tolist(),
+                            min_headway=min_headway)
+    # Saved already rescaled to mean 1; rescaling again could move them by an ulp.
+    profile.headways = a["profile.headways"].copy()
+    return profile
+
+def _restore_generator(gen, a):
+    state_hi, state_lo, inc_hi, inc_lo, has_uint32, uinteger = (int(v) for v in a["generator.rng"])
+    gen.rng.bit_generator.state = {"bit_generator": "PCG64",
+                                   "state": {"state": state_hi << 64 | state_lo, "inc": inc_hi << 64 | inc_lo},
+                                   "has_uint32": has_uint32, "uinteger": uinteger}
+    gen.cursor = [None if math.isnan(u) else u for u in a["generator.cursor"].tolist()]
+    gen.lane_last = a["generator.lane_last"].copy()
+    gen.horizon, window_end = a["generator.window"].tolist()
+    gen.window_end = None if math.isnan(window_end) else window_end
+    gen.batches, gen.generated = a["generator.counts"].tolist()
+    gen.times = a["generator.times"].copy()
+    gen.origins = a["generator.origins"].copy()
+    gen.lanes = a["generator.lanes"].copy()
+    gen.next = 0
+
+def _lookahead(a):
+    # SignalOptimizer options, so a restored look-ahead run keeps the same model.
+    cycles, recheck, lost_time, budget, quantum, cache_size = a["optimizer.params"].tolist()
+    return {"cycles": int(cycles), "extensions": tuple(a["optimizer.extensions"].tolist()), "recheck": recheck,
+            "lost_time": lost_time, "budget": None if math.isnan(budget) else budget, "quantum": quantum,
+            "cache_size": int(cache_size)}
+
+def snapshot(sim):
+    store, counters, m, p = sim.vehicles, sim.vehicles.counters, sim.intersection_manager, sim.predictor
+    n = store.count
+    arrays = {
+        "seed": np.int64(sim.seed), "dt": np.float64(sim.dt),
+        "mode": np.uint8(int(sim.is_smart_mode) | (sim.optimizer is not None) << 1),
+        "spawn_interval": np.float64(sim.spawn_interval if sim.spawn_interval else math.nan),
+        "demand": np.frombuffer("".join(sim.demand_directions).encode("ascii"), dtype=np.uint8),
+        "clock": np.array([sim.spawn_timer, sim.accumulator, sim.time, sim.total_delay]),
+        "ticks": np.array([sim.ticks, sim.exited], dtype=np.int64),
+        "light_codes": sim.light_codes,
+    }
+    for name in RNGS:
+        version, state, gauss = getattr(sim, name).getstate()
+        arrays[f"{name}.state"] = np.array(state, dtype=np.uint32)
+        arrays[f"{name}.gauss"] = np.float64(math.nan if gauss is None else gauss)
+
+    for name in store.FIELDS:
+        arrays[f"vehicles.{name}"] = getattr(store, name)[:n]
+    arrays["vehicles.next_id"] = np.int64(store.next_id)
+    arrays["vehicles.lane_head"] = np.array(store.lane_head, dtype=np.int32)
+    arrays["vehicles.lane_tail"] = np.array(store.lane_tail, dtype=np.int32)
+    for name in COUNTER_ARRAYS:
+        arrays[f"counters.{name}"] = getattr(counters, name)
+    arrays["counters.totals"] = np.array([counters.total, counters.emergencies_present], dtype=np.int64)
+    arrays["counters.active_emergencies"] = np.array(list(counters.active_emergencies.items()), dtype=np.int64).reshape(-1, 2)
+
+    arrays["lights.state"] = np.array([LIGHT_CODE[light.state] for light in sim.lights], dtype=np.uint8)
+    arrays["lights.remaining_time"] = np.array([light.remaining_time for light in sim.lights], dtype=np.int64)
+    arrays["signals.timing"] = np.array([m.min_green, m.max_green, m.yellow_duration, m.fixed_green_duration])
+    arrays["signals.phase"] = np.array([PHASE_CODE[m.phase], GROUP_CODE[m.active_group],
+                                        DIR_CODE[m.preempted_for] if m.preempted_for else -1], dtype=np.int8)
+    arrays["signals.timers"] = np.array([m.phase_timer, m.green_duration])
+
+    arrays["predictor.name"] = np.frombuffer(p.name.encode("utf-8"), dtype=np.uint8)
+    arrays["predictor.params"] = np.array([p.tau, p.startup_lost_time, *p.levels, p.current_green_duration])
+    for name in PREDICTOR_ARRAYS:
+        arrays[f"predictor.{name}"] = getattr(p, name)
+    o = sim.optimizer
+    if o:
+        arrays["optimizer.params"] = np.array([o.cycles, o.recheck, o.lost_time, math.nan if o.budget is None else o.budget,
+                                               o.quantum, o.cache_size])
+        arrays["optimizer.extensions"] = np.array(o.extensions, dtype=np.float64)
+        # Memoized decisions, one row per entry in LRU order: group, elapsed, bucket counts, extension.
+        arrays["optimizer.cache"] = np.array([[group, elapsed, *sum(queues, ()), best]
+                                              for (group, elapsed, queues), best in o.cache.items()],
+                                             dtype=np.float64).reshape(-1, 3 + 4 * len(ETA_BUCKETS))
+        arrays["optimizer.counts"] = np.array([o.decisions, o.cache_hits, o.rollouts, o.cutoffs], dtype=np.int64)
+    if sim.demand:
+        _demand_arrays(arrays, sim.demand)
+    return _pack(arrays)
+
+def save_snapshot(sim, path):
+    with open(path, "wb") as f:
+        f.write(snapshot(sim))
+
+def restore(data, seed=None, **variant):
+    # variant: any Simulation argument (is_smart_mode, demand_directions, demand,
+    # spawn_interval, timing, lookahead, on_exit); timing is merged into the
+    # snapshot's. A seed other than the snapshot's gives fresh RNG streams.
+    from simulation.engine import Simulation
+
+    a = _unpack(data)
+    mode = int(a["mode"])
+    timing = dict(zip(("min_green", "max_green", "yellow_duration", "fixed_green_duration"),
+                      a["signals.timing"].tolist()))
+    timing.update(variant.pop("timing", None) or {})
+    options = {
+        "is_smart_mode": bool(mode & 1),
+        "demand_directions": list(a["demand"].tobytes().decode("ascii")),
+        "spawn_interval": None if math.isnan(a["spawn_interval"]) else float(a["spawn_interval"]),
+        "lookahead": _lookahead(a) if mode & 2 else None,
+        "demand": _profile(a) if "profile.params" in a else None,
+    }
+    fresh_demand = "demand" in variant
+    fresh_lookahead = "lookahead" in variant
+    options.update(variant)
+    reseed = seed is not None and seed != int(a["seed"])
+    sim = Simulation(dt=float(a["dt"]), seed=seed if reseed else int(a["seed"]), timing=timing, **options)
+
+    sim.spawn_timer, sim.accumulator, sim.time, sim.total_delay = a["clock"].tolist()
+    sim.ticks, sim.exited = a["ticks"].tolist()
+    sim.light_codes[:] = a["light_codes"]
+    if not reseed:
+        for name in RNGS:
+            gauss = float(a[f"{name}.gauss"])
+            getattr(sim, name).setstate((3, tuple(a[f"{name}.state"].tolist()), None if math.isnan(gauss) else gauss))
+        if sim.demand and not fresh_demand:
+            _restore_generator(sim.demand, a)
+
+    store, counters = sim.vehicles, sim.vehicles.counters
+    n = len(a["vehicles.ids"])
+    while store.capacity < n:
+        store._grow()
+    for name in store.FIELDS:
+        getattr(store, name)[:n] = a[f"vehicles.{name}"]
+    store.count = n
+    store.next_id = int(a["vehicles.next_id"])
+    store.lane_head = a["vehicles.lane_head"].tolist()
+    store.lane_tail = a["vehicles.lane_tail"].tolist()
+    store.views = [Vehicle(store, i) for i in range(n)]
+    for slot in np.flatnonzero(store.in_box[:n]):
+        store.box.enter(int(store.direction[slot]))
+    for name in COUNTER_ARRAYS:
+        getattr(counters, name)[:] = a[f"counters.{name}"]
+    counters.total, counters.emergencies_present = a["counters.totals"].tolist()
+    counters.active_emergencies = {vehicle_id: code for vehicle_id, code in a["counters.active_emergencies"].tolist()}
+
+    for light, state, remaining in zip(sim.lights, a["lights.state"].tolist(), a["lights.remaining_time"].tolist()):
+        light.state, light.remaining_time = LIGHT_STATES[state], remaining
+    m = sim.intersection_manager
+    phase, group, preempted = a["signals.phase"].tolist()
+    m.phase, m.active_group = PHASES[phase], GROUPS[group]
+    m.preempted_for = DIRECTIONS[preempted] if preempted >= 0 else None
+    m.phase_timer, m.green_duration = a["signals.timers"].tolist()
+
+    p = sim.predictor
+    p.name = a["predictor.name"].tobytes().decode("utf-8")
+    p.tau, p.startup_lost_time, low, high, p.current_green_duration = a["predictor.params"].tolist()
+    p.levels = (low, high)
+    for name in PREDICTOR_ARRAYS:
+        getattr(p, name)[:] = a[f"predictor.{name}"]
+
+    o = sim.optimizer
+    if o and "optimizer.cache" in a and not fresh_lookahead:
+        buckets = len(ETA_BUCKETS)
+        for row in a["optimizer.cache"].tolist():
+            counts = [int(c) for c in row[2:-1]]
+            queues = tuple(tuple(counts[i * buckets:(i + 1) * buckets]) for i in range(4))
+            o.cache[int(row[0]), int(row[1]), queues] = row[-1]
+        o.decisions, o.cache_hits, o.rollouts, o.cutoffs = a["optimizer.counts"].tolist()
+    return sim
+
+def load_snapshot(path, seed=None, **variant):
+    with open(path, "rb") as f:
+        return restore(f.read(), seed, **variant)
+
+def fork(sim, seed=None, **variant):
+    # In-process copy of `sim` that can be run on independently.
+    return restore(snapshot(sim), seed, **variant)
+
+def main():
+    from simulation.engine import Simulation
+    from simulation.sweep import DEMAND_MIXES
+
+    parser = argparse.ArgumentParser(description="Warm up a simulation and save a snapshot of it")
+    parser.add_argument("--seconds", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--demand", default="rush_hour_ns", choices=list(DEMAND_MIXES))
+    parser.add_argument("--spawn-interval", type=float, default=None)
+    parser.add_argument("--fixed", action="store_true", help="warm up in fixed-timer mode")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    sim = Simulation(is_smart_mode=not args.fixed, seed=args.seed, demand_directions=DEMAND_MIXES[args.demand],
+                     spawn_interval=args.spawn_interval)
+    sim.run(args.seconds)
+    save_snapshot(sim, args.out)
+    print(f"{args.out}: t={sim.time:.1f}s, {sim.vehicles.count} vehicles")
+
+if __name__ == "__main__":
+    main()
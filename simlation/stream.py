@@ -0,0 +1,316 @@
+# simulation/stream.py
+# Live state streaming for remote dashboards. A StateServer runs an asyncio
+# event loop on its own thread and accepts any number of viewers, over plain
+# TCP (every frame prefixed with its u32 length) and/or WebSocket (one binary
+# message per frame). The simulation thread calls publish(sim) after its ticks;
+# that encodes a frame every 1/rate seconds of simulated time, counted in whole
+# ticks, and hands it to the loop without waiting on it, so viewers never hold
+# up the simulation.
+#
+# Frames are encoded once and shared by every viewer:
+#   kind u8 | blocks u8 | seq u32 | tick u32 | time f64 | updated u32 | removed u32
+#   [signals] [lights] [status]                 only the blocks flagged in `blocks`
+#   updated x VEHICLE_DTYPE                     new vehicles and ones that moved a pixel
+#   removed x id u32                            vehicles gone since the last frame
+# A KEYFRAME carries everything; a DELTA only what changed since the frame
+# before it. Each viewer has a small queue: one that falls behind has its
+# queue dropped and skips deltas until the next keyframe, which it asks for.
+#
+#   python -m simulation.stream --port 8765 --ws-port 8766
+import argparse
+import asyncio
+import base64
+import hashlib
+import struct
+import threading
+import time
+
+import numpy as np
+
+from simulation.trace import PHASE_CODE, GROUP_CODE, DIR_CODE
+from simulation.vehicle_store import LIGHT_CODE
+
+KEYFRAME, DELTA = 1, 2
+SIGNALS, LIGHTS, STATUS = 1, 2, 4
+HEADER = struct.Struct("<BBIIdII")
+SIGNAL_BLOCK = struct.Struct("<BBbf")   # phase, group, emergency direction (-1 none), green_duration
+LIGHT_BLOCK = struct.Struct("<8B8B")    # state code and whole seconds remaining per light
+STATUS_BLOCK = struct.Struct("<IIBH4H4H")  # total, exited, smart mode, emergencies, queued[4], waiting[4]
+VEHICLE_DTYPE = np.dtype([("id", "<u4"), ("x", "<i2"), ("y", "<i2"), ("kind", "u1")])  # kind: direction | lane-1 << 2 | emergency << 3
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+class FrameEncoder:
+    def __init__(self, keyframe_every=100):
+        self.keyframe_every = keyframe_every
+        self.seq = 0
+        self.sent = np.zeros(0, dtype=VEHICLE_DTYPE)  # last frame's vehicles, sorted by id
+        self.blocks = {}
+
+    def encode(self, sim, keyframe=False):
+        # Returns (frame bytes, is_keyframe).
+        keyframe = keyframe or self.seq % self.keyframe_every == 0
+        store, m, counters = sim.vehicles, sim.intersection_manager, sim.vehicles.counters
+        n = store.count
+        vehicles = np.empty(n, dtype=VEHICLE_DTYPE)
+        vehicles["id"] = store.ids[:n]
+        vehicles["x"] = np.rint(store.x[:n])
+        vehicles["y"] = np.rint(store.y[:n])
+        vehicles["kind"] = store.direction[:n] | (store.lane[:n] - 1) << 2 | store.emergency[:n].astype(np.int8) << 3
+        vehicles.sort(order="id")
+
+        blocks = {
+            SIGNALS: SIGNAL_BLOCK.pack(PHASE_CODE[m.phase], GROUP_CODE[m.active_group],
+                                       DIR_CODE[m.preempted_for] if m.preempted_for else -1, m.green_duration),
+            LIGHTS: LIGHT_BLOCK.pack(*(LIGHT_CODE[light.state] for light in sim.lights),
+                                     *(min(255, max(0, light.remaining_time)) for light in sim.lights)),
+            STATUS: STATUS_BLOCK.pack(counters.total, sim.exited, sim.is_smart_mode, counters.emergencies_present,
+                                      *np.minimum(counters.queued, 65535), *np.minimum(counters.waiting, 65535)),
+        }
+        if keyframe:
+            updated, removed = vehicles, np.zeros(0, dtype="<u4")
+            changed = SIGNALS | LIGHTS | STATUS
+        else:
+            sent = self.sent
+            at = np.minimum(np.searchsorted(sent["id"], vehicles["id"]), max(len(sent) - 1, 0))
+            known = (at < len(sent)) & (sent["id"][at] == vehicles["id"]) if len(sent) else np.zeros(n, dtype=bool)
+            moved = ~known
+            if len(sent):
+                moved |= (sent["x"][at] != vehicles["x"]) | (sent["y"][at] != vehicles["y"])
+            updated = vehicles[moved]
+            removed = sent["id"][~np.isin(sent["id"], vehicles["id"], assume_unique=True)].astype("<u4")
+            changed = sum(flag for flag, data in blocks.items() if self.blocks.get(flag) != data)
+        self.sent, self.blocks = vehicles, blocks
+
+        parts = [HEADER.pack(KEYFRAME if keyframe else DELTA, changed, self.seq, sim.ticks, sim.time,
+                             len(updated), len(removed))]
+        parts += [blocks[flag] for flag in (SIGNALS, LIGHTS, STATUS) if changed & flag]
+        parts += [updated.tobytes(), removed.tobytes()]
+        self.seq += 1
+        return b"".join(parts), keyframe
+
+# Rebuilds the stream's state on the viewer side; apply() takes one frame.
+class FrameDecoder:
+    def __init__(self):
+        self.vehicles = np.zeros(0, dtype=VEHICLE_DTYPE)
+        self.signals = self.lights = self.status = None
+        self.seq = None
+        self.tick = 0
+        self.time = 0.0
+
+    def apply(self, frame):
+        kind, changed, seq, self.tick, self.time, n_updated, n_removed = HEADER.unpack_from(frame)
+        if kind == DELTA and (self.seq is None or seq != self.seq + 1):
+            raise ValueError(f"delta frame {seq} does not follow frame {self.seq}")
+        self.seq = seq
+        pos = HEADER.size
+        for flag, block, name in ((SIGNALS, SIGNAL_BLOCK, "signals"), (LIGHTS, LIGHT_BLOCK, "lights"),
+                                  (STATUS, STATUS_BLOCK, "status")):
+            if changed & flag:
+                setattr(self, name, block.unpack_from(frame, pos))
+                pos += block.size
+        updated = np.frombuffer(frame, dtype=VEHICLE_DTYPE, count=n_updated, offset=pos)
+        removed = np.frombuffer(frame, dtype="<u4", count=n_removed, offset=pos + updated.nbytes)
+        if kind == KEYFRAME:
+            self.vehicles = updated.copy()
+        else:
+            keep = self.vehicles[~np.isin(self.vehicles["id"], removed) & ~np.isin(self.vehicles["id"], updated["id"])]
+            self.vehicles = np.concatenate([keep, updated])
+            self.vehicles.sort(order="id")
+        return self
+
+class _Viewer:
+    def __init__(self, writer, websocket, max_queue):
+        self.writer = writer
+        self.websocket = websocket
+        self.task = asyncio.current_task()
+        self.queue = asyncio.Queue(max_queue)
+        self.synced = False
+        self.dropped = 0
+
+def _ws_frame(payload, opcode=0x2):
+    n = len(payload)
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 65536:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return head + payload
+
+class StateServer:
+    def __init__(self, host="127.0.0.1", port=8765, ws_port=None, rate=20.0, keyframe_every=100, max_queue=16):
+        self.host = host
+        self.port = port
+        self.ws_port = ws_port
+        self.rate = rate
+        self.max_queue = max_queue
+        self.encoder = FrameEncoder(keyframe_every)
+        self.viewers = set()
+        self.keyframe_requested = False
+        self.interval = None # ticks between frames, once the simulation's dt is known
+        self.next_tick = None
+        self.loop = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.frames = self.keyframes = self.bytes_sent = self.drops = 0
+
+    # --- Simulation thread ---
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def publish(self, sim):
+        if not self.viewers:
+            self.next_tick = None
+            return
+        if self.interval is None:
+            self.interval = max(1, round(1.0 / (self.rate * sim.dt)))
+        if self.next_tick is not None and sim.ticks < self.next_tick:
+            return
+        # Keep to the tick grid; the first frame, or one after a gap, starts it afresh.
+        if self.next_tick is None or sim.ticks >= self.next_tick + self.interval:
+            self.next_tick = sim.ticks
+        self.next_tick += self.interval
+        keyframe, self.keyframe_requested = self.keyframe_requested, False
+        frame, keyframe = self.encoder.encode(sim, keyframe=keyframe)
+        self.loop.call_soon_threadsafe(self._broadcast, frame, keyframe)
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._stop.set)
+            self.thread.join()
+            self.loop = None
+
+    def stats(self):
+        return {"viewers": len(self.viewers), "frames": self.frames, "keyframes": self.keyframes,
+                "bytes_sent": self.bytes_sent, "drops": self.drops}
+
+    # --- Event loop thread ---
+    def _run(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        servers = [await asyncio.start_server(self._handle_tcp, self.host, self.port)] if self.port is not None else []
+        if self.ws_port is not None:
+            servers.append(await asyncio.start_server(self._handle_ws, self.host, self.ws_port))
+        # Port 0 picks a free port; report the real ones.
+        ports = [s.sockets[0].getsockname()[1] for s in servers]
+        if self.port is not None:
+            self.port = ports.pop(0)
+        if self.ws_port is not None:
+            self.ws_port = ports.pop(0)
+        self.ready.set()
+        await self._stop.wait()
+        for server in servers:
+            server.close()
+        for viewer in list(self.viewers):
+            viewer.writer.close()
+        await asyncio.gather(*(viewer.task for viewer in list(self.viewers)), return_exceptions=True)
+
+    def _broadcast(self, frame, keyframe):
+        self.frames += 1
+        self.keyframes += keyframe
+        tcp = struct.pack("<I", len(frame)) + frame
+        ws = _ws_frame(frame)
+        for viewer in self.viewers:
+            if not (viewer.synced or keyframe):
+                continue
+            if viewer.queue.full():
+                # Fell behind: drop what is queued and wait for a keyframe to resync.
+                while not viewer.queue.empty():
+                    viewer.queue.get_nowait()
+                viewer.synced = False
+                viewer.dropped += 1
+                self.drops += 1
+                self.keyframe_requested = True
+                if not keyframe:
+                    continue
+            viewer.queue.put_nowait(ws if viewer.websocket else tcp)
+            viewer.synced = True
+
+    async def _send(self, viewer):
+        while True:
+            data = await viewer.queue.get()
+            viewer.writer.write(data)
+            self.bytes_sent += len(data)
+            await viewer.writer.drain()
+
+    async def _serve_viewer(self, viewer, receive):
+        self.viewers.add(viewer)
+        self.keyframe_requested = True
+        sender = asyncio.create_task(self._send(viewer))
+        try:
+            await receive()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.viewers.discard(viewer)
+            sender.cancel()
+            viewer.writer.close()
+
+    async def _handle_tcp(self, reader, writer):
+        async def receive():
+            while await reader.read(1024):
+                pass  # viewers have nothing to say; EOF means they left
+        await self._serve_viewer(_Viewer(writer, False, self.max_queue), receive)
+
+    async def _handle_ws(self, reader, writer):
+        request = await reader.readuntil(b"\r\n\r\n")
+        headers = dict(line.split(b":", 1) for line in request.split(b"\r\n")[1:] if b":" in line)
+        key = {k.strip().lower(): v.strip() for k, v in headers.items()}.get(b"sec-websocket-key")
+        if not key:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            writer.close()
+            return
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+
+        async def receive():
+            while True:
+                b0, b1 = await reader.readexactly(2)
+                opcode, n = b0 & 0x0F, b1 & 0x7F
+                if n == 126:
+                    n = struct.unpack("!H", await reader.readexactly(2))[0]
+                elif n == 127:
+                    n = struct.unpack("!Q", await reader.readexactly(8))[0]
+                mask = await reader.readexactly(4) if b1 & 0x80 else b"\0\0\0\0"
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(await reader.readexactly(n)))
+                if opcode == 0x8:
+                    writer.write(_ws_frame(payload[:2], 0x8))
+                    return
+                if opcode == 0x9:
+                    writer.write(_ws_frame(payload, 0xA))
+        await self._serve_viewer(_Viewer(writer, True, self.max_queue), receive)
+
+def main():
+    from simulation.engine import Simulation
+
+    parser = argparse.ArgumentParser(description="Run a headless simulation in real time and stream its state")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ws-port", type=int, default=8766)
+    parser.add_argument("--rate", type=float, default=20.0, help="frames per simulated second")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    sim = Simulation(seed=args.seed)
+    server = StateServer(args.host, args.port, args.ws_port, args.rate).start()
+    print(f"streaming on tcp://{args.host}:{server.port} and ws://{args.host}:{server.ws_port}")
+    last = time.perf_counter()
+    try:
+        while True:
+            time.sleep(1.0 / args.rate)
+            now = time.perf_counter()
+            sim.advance(now - last)
+            last = now
+            server.publish(sim)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# simulation/sweep.py
+# Monte Carlo comparison of signal control settings. Each run is a seeded,
+# headless Simulation; runs are fanned out over a process pool and the
+# per-scenario results are reduced to means with 95% confidence intervals.
+#
+#   python -m simulation.sweep --replications 100 --seconds 600 --workers 8
+import argparse
+import itertools
+import json
+import math
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+from simulation.config import MIN_GREEN, MAX_GREEN, YELLOW_DURATION, FIXED_GREEN_DURATION
+from simulation.engine import Simulation, RUSH_HOUR_DIRECTIONS
+from simulation.snapshot import restore
+
+DEMAND_MIXES = {
+    "rush_hour_ns": RUSH_HOUR_DIRECTIONS,
+    "balanced": ["N", "S", "E", "W"],
+    "rush_hour_ew": ["E", "E", "E", "W", "W", "W", "N", "S"],
+}
+DEFAULT_TIMING = {"min_green": MIN_GREEN, "max_green": MAX_GREEN,
+                  "yellow_duration": YELLOW_DURATION, "fixed_green_duration": FIXED_GREEN_DURATION}
+MODES = ("smart", "fixed", "lookahead")
+METRICS = ("mean_delay", "throughput", "mean_queue", "max_queue")
+
+# Two-sided 95% Student t critical values; beyond 30 degrees of freedom 1.96 is close enough.
+_T95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+def scenario_grid(modes=("smart", "fixed"), demands=("rush_hour_ns",), spawn_intervals=(0.6,), timings=(None,)):
+    scenarios = []
+    for mode, demand, interval, timing in itertools.product(modes, demands, spawn_intervals, timings):
+        scenarios.append({"mode": mode, "demand": demand, "spawn_interval": interval,
+                          "timing": dict(DEFAULT_TIMING, **(timing or {}))})
+    return scenarios
+
+def scenario_name(scenario):
+    t = scenario["timing"]
+    return (f"{scenario['mode']}/{scenario['demand']}/every {scenario['spawn_interval']}s/"
+            f"green {t['min_green']}-{t['max_green']} fixed {t['fixed_green_duration']} yellow {t['yellow_duration']}")
+
+def run_scenario(scenario, seed, seconds=600, warmup=120, snapshot=None):
+    # No time budget for the look-ahead optimizer, so a run's decisions do not depend on the machine.
+    options = {"is_smart_mode": scenario["mode"] != "fixed", "demand_directions": DEMAND_MIXES[scenario["demand"]],
+               "spawn_interval": scenario["spawn_interval"], "timing": scenario["timing"],
+               "lookahead": {"budget": None} if scenario["mode"] == "lookahead" else None}
+    if snapshot:
+        # Fork from the warmed-up state instead of warming up from an empty road.
+        sim = restore(snapshot, seed, **options)
+    else:
+        sim = Simulation(seed=seed, **options)
+        sim.run(warmup)
+    exited, total_delay = sim.exited, sim.total_delay
+    queued = sim.vehicles.counters.queued
+    ticks = int(round(seconds / sim.dt))
+    queue_sum = queue_max = 0
+    for _ in range(ticks):
+        sim.tick()
+        q = int(queued.sum())
+        queue_sum += q
+        queue_max = max(queue_max, q)
+    exited = sim.exited - exited
+    return {
+        "mean_delay": (sim.total_delay - total_delay) / exited if exited else 0.0,
+        "throughput": exited * 3600.0 / seconds,
+        "mean_queue": queue_sum / ticks,
+        "max_queue": queue_max,
+    }
+
+_snapshot = None
+
+def _set_snapshot(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+
+def _run_task(task):
+    index, scenario, seed, seconds, warmup = task
+    return index, run_scenario(scenario, seed, seconds, warmup, _snapshot)
+
+def confidence_interval(values):
+    n = len(values)
+    mean = statistics.fmean(values)
+    if n < 2:
+        return mean, 0.0
+    t = _T95[n - 2] if n - 1 <= len(_T95) else 1.96
+    return mean, t * statistics.stdev(values) / math.sqrt(n)
+
+def summarize(results):
+    summary = {}
+    for metric in METRICS:
+        mean, half_width = confidence_interval([r[metric] for r in results])
+        summary[metric] = {"mean": mean, "ci95": half_width}
+    return summary
+
+def run_sweep(scenarios, replications=30, seconds=600, warmup=120, workers=None, base_seed=0, snapshot=None):
+    # Replication r of every scenario uses the same seed (common random numbers),
+    # so differences between scenarios are not swamped by demand noise. Given a
+    # snapshot, every run forks from it, so replications share their start state.
+    tasks = [(i, scenario, base_seed + r, seconds, warmup)
+             for i, scenario in enumerate(scenarios) for r in range(replications)]
+    per_scenario = [[] for _ in scenarios]
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_set_snapshot, initargs=(snapshot,)) as pool:
+        for index, result in pool.map(_run_task, tasks, chunksize=chunksize):
+            per_scenario[index].append(result)
+    return [{"scenario": scenario, "name": scenario_name(scenario), "runs": len(results), **summarize(results)}
+            for scenario, results in zip(scenarios, per_scenario)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel smart vs fixed signal control sweep")
+    parser.add_argument("--modes", nargs="+", default=["smart", "fixed"], choices=MODES)
+    parser.add_argument("--replications", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=600)
+    parser.add_argument("--warmup", type=float, default=120)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--demands", nargs="+", default=list(DEMAND_MIXES))
+    parser.add_argument("--spawn-intervals", nargs="+", type=float, default=[0.6])
+    parser.add_argument("--min-green", nargs="+", type=float, default=[MIN_GREEN])
+    parser.add_argument("--max-green", nargs="+", type=float, default=[MAX_GREEN])
+    parser.add_argument("--yellow", nargs="+", type=float, default=[YELLOW_DURATION])
+    parser.add_argument("--fixed-green", nargs="+", type=float, default=[FIXED_GREEN_DURATION])
+    parser.add_argument("--snapshot", help="fork every run from this snapshot instead of warming up")
+    parser.add_argument("--out", help="write the full results as JSON")
+    args = parser.parse_args()
+    snapshot = None
+    if args.snapshot:
+        with open(args.snapshot, "rb") as f:
+            snapshot = f.read()
+
+    timings = [{"min_green": a, "max_green": b, "yellow_duration": c, "fixed_green_duration": d}
+               for a, b, c, d in itertools.product(args.min_green, args.max_green, args.yellow, args.fixed_green)]
+    scenarios = scenario_grid(args.modes, demands=args.demands, spawn_intervals=args.spawn_intervals, timings=timings)
+    results = run_sweep(scenarios, args.replications, args.seconds, args.warmup, args.workers, args.seed, snapshot)
+    for row in results:
+        cells = "  ".join(f"{m}={row[m]['mean']:.2f}±{row[m]['ci95']:.2f}" for m in METRICS)
+        print(f"{row['name']}  n={row['runs']}  {cells}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# simulation/trace.py
+# Compact binary record/replay of a Simulation run.
+#
+# A trace is a fixed header followed by 16-byte event records:
+#   tick u32 | kind u8 | a u8 | b u8 | c u8 | value 8 bytes
+# SPAWN   a=direction code, b=lane, c=is_emergency
+# MODE    a=is_smart_mode
+# DT      value=float64 tick length (written only when it changes)
+# PHASE   a=phase code, b=group code (or emergency direction), value=float64 green_duration
+# CHECK   value=crc32 of the full vehicle and signal state at the end of tick-1
+#
+# Spawns and mode toggles are the only inputs. The header carries a snapshot
+# (see simulation/snapshot.py) of the state recording started from, so a run
+# can be recorded from any tick; replaying the inputs through the restored
+# Simulation reproduces the run, and the PHASE and CHECK records let the
+# replay stop at the first tick where it diverges.
+#
+# The header's mode byte holds is_smart_mode in bit 0 and look-ahead control
+# in bit 1. A look-ahead run replays with its recorded options but no time
+# budget, so it only reproduces if it was recorded that way too.
+import math
+import struct
+
+import numpy as np
+
+from simulation.vehicle import DIRECTIONS
+
+MAGIC = b"SIMTRC02"
+HEADER = struct.Struct("<8sqdBd4dBI")
+RECORD = struct.Struct("<IBBBBd")
+RECORD_DTYPE = np.dtype([("tick", "<u4"), ("kind", "u1"), ("a", "u1"), ("b", "u1"), ("c", "u1"), ("value", "<f8")])
+
+SPAWN, MODE, DT, PHASE, CHECK = 1, 2, 3, 4, 5
+PHASE_CODE = {"green": 0, "yellow": 1, "emergency": 2}
+GROUP_CODE = {("N", "S"): 0, ("E", "W"): 1}
+DIR_CODE = {d: i for i, d in enumerate(DIRECTIONS)}
+
+class ReplayDivergence(Exception):
+    pass
+
+def phase_record(manager):
+    if manager.preempted_for:
+        return PHASE_CODE["emergency"], DIR_CODE[manager.preempted_for], 0.0
+    return PHASE_CODE[manager.phase], GROUP_CODE[manager.active_group], float(manager.green_duration)
+
+class TraceRecorder:
+    def __init__(self, sim, path, checkpoint_every=600, buffer_records=4096):
+        from simulation.snapshot import snapshot
+
+        self.file = open(path, "wb")
+        self.checkpoint_every = checkpoint_every
+        self.buffer = bytearray(RECORD.size * buffer_records)
+        self.used = 0
+        self.last_dt = None
+        manager = sim.intersection_manager
+        demand = "".join(sim.demand_directions).encode("ascii")
+        mode = int(sim.is_smart_mode) | (sim.optimizer is not None) << 1
+        start = snapshot(sim)
+        self.file.write(HEADER.pack(MAGIC, sim.seed, sim.dt, mode,
+                                    sim.spawn_interval if sim.spawn_interval else math.nan,
+                                    manager.min_green, manager.max_green, manager.yellow_duration,
+                                    manager.fixed_green_duration, len(demand), len(start)))
+        self.file.write(demand)
+        self.file.write(start)
+
+    def _write(self, tick, kind, a=0, b=0, c=0, value=0.0):
+        if self.used == len(self.buffer):
+            self.flush()
+        RECORD.pack_into(self.buffer, self.used, tick, kind, a, b, c, value)
+        self.used += RECORD.size
+
+    def flush(self):
+        self.file.write(memoryview(self.buffer)[:self.used])
+        self.used = 0
+
+    def spawn(self, tick, direction, lane, is_emergency):
+        self._write(tick, SPAWN, DIR_CODE[direction], lane, is_emergency)
+
+    def mode(self, tick, is_smart_mode):
+        self._write(tick, MODE, is_smart_mode)
+
+    def begin_tick(self, sim, dt):
+        if sim.ticks and sim.ticks % self.checkpoint_every == 0:
+            self._write(sim.ticks, CHECK, value=sim.state_digest())
+        if dt != self.last_dt:
+            self._write(sim.ticks, DT, value=dt)
+            self.last_dt = dt
+
+    def phase(self, tick, manager):
+        a, b, value = phase_record(manager)
+        self._write(tick, PHASE, a, b, value=value)
+
+    def close(self, sim):
+        self._write(sim.ticks, CHECK, value=sim.state_digest())
+        self.flush()
+        self.file.close()
+
+def read_trace(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, seed, dt, smart, interval, min_green, max_green, yellow, fixed_green, n_demand, n_start = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a simulation trace")
+    offset = HEADER.size
+    demand = data[offset:offset + n_demand].decode("ascii")
+    offset += n_demand
+    header = {
+        "seed": seed, "dt": dt, "is_smart_mode": bool(smart & 1), "lookahead": bool(smart & 2),
+        "spawn_interval": None if math.isnan(interval) else interval,
+        "timing": {"min_green": min_green, "max_green": max_green,
+                   "yellow_duration": yellow, "fixed_green_duration": fixed_green},
+        "demand_directions": list(demand),
+        "snapshot": data[offset:offset + n_start],
+    }
+    return header, np.frombuffer(data, dtype=RECORD_DTYPE, offset=offset + n_start)
+
+# Feeds recorded inputs back into a Simulation tick by tick and checks the
+# recorded phase changes and state digests against what the replay produces.
+class TracePlayer:
+    def __init__(self, events):
+        self.events = events
+        self.pos = 0
+        self.dt = None
+        self.last_tick = int(events["tick"][-1]) if len(events) else 0
+
+    def begin_tick(self, sim):
+        events, tick = self.events, sim.ticks
+        while self.pos < len(events) and events["tick"][self.pos] <= tick:
+            e = events[self.pos]
+            kind = e["kind"]
+            if kind == SPAWN:
+                sim.vehicles.add(DIRECTIONS[e["a"]], int(e["b"]), bool(e["c"]), sim.time)
+            elif kind == MODE:
+                sim.is_smart_mode = bool(e["a"])
+            elif kind == DT:
+                self.dt = float(e["value"])
+            elif kind == CHECK:
+                if sim.state_digest() != e["value"]:
+                    raise ReplayDivergence(f"state digest differs before tick {tick}")
+            elif kind == PHASE:
+                if e["tick"] < tick:
+                    raise ReplayDivergence(f"phase change recorded at tick {e['tick']} did not happen")
+                break  # checked as the replay produces its own phase changes
+            self.pos += 1
+        return self.dt
+
+    def phase(self, tick, manager):
+        events = self.events
+        if self.pos >= len(events) or events["kind"][self.pos] != PHASE:
+            raise ReplayDivergence(f"unexpected phase change at tick {tick}")
+        e = events[self.pos]
+        a, b, value = phase_record(manager)
+        if (int(e["tick"]), int(e["a"]), int(e["b"]), float(e["value"])) != (tick, a, b, value):
+            raise ReplayDivergence(f"phase change at tick {tick} does not match the trace (recorded at tick {e['tick']})")
+        self.pos += 1
+
+def replay(path):
+    from simulation.snapshot import restore
+
+    header, events = read_trace(path)
+    sim = restore(header["snapshot"])
+    if sim.optimizer:
+        sim.optimizer.budget = None
+    sim.player = TracePlayer(events)
+    while sim.ticks < sim.player.last_tick:
+        sim.tick()
+    sim.player.begin_tick(sim)  # apply and verify the closing records
+    return sim
@@ -1,6 +1,4 @@
 # traffic_light.py
-import pygame
-
 LIGHT_RADIUS = 8
 
 class TrafficLight:
@@ -13,22 +11,25 @@ class TrafficLight:
         self.remaining_time = 0
 
     def draw(self, screen):
+        import pygame
+        from simulation.render import glyphs
+
         if self.state == "green": col = (0, 200, 0)
         elif self.state == "yellow": col = (255, 200, 0)
         else: col = (255, 0, 0)
 
-        pygame.draw.circle(screen, col, (int(self.x), int(self.y)), LIGHT_RADIUS)
+        rect = pygame.draw.circle(screen, col, (int(self.x), int(self.y)), LIGHT_RADIUS)
         pygame.draw.circle(screen, (50, 50, 50), (int(self.x), int(self.y)), LIGHT_RADIUS, 1)
 
         # --- UI CLEANUP: Only show details for the primary lane's light ---
         if self.lane == 1:
             # Draw the lane number
-            font = pygame.font.SysFont("Arial", 12, bold=True)
-            txt = font.render(str(self.direction), True, (255, 255, 255))
-            screen.blit(txt, (self.x + LIGHT_RADIUS, self.y - LIGHT_RADIUS))
+            txt = glyphs.render(str(self.direction), ("Arial", 12, True), (255, 255, 255))
+            rect.union_ip(screen.blit(txt, (self.x + LIGHT_RADIUS, self.y - LIGHT_RADIUS)))
 
             # Draw the countdown timer
             if self.remaining_time > 0:
-                timer_font = pygame.font.SysFont("Arial", 16, bold=True)
-                timer_txt = timer_font.render(str(self.remaining_time), True, (255, 255, 255))
-                screen.blit(timer_txt, (self.x - timer_txt.get_width() // 2, self.y - 30))
\ No newline at end of file
+                timer_txt = glyphs.render(str(self.remaining_time), ("Arial", 16, True), (255, 255, 255))
+                rect.union_ip(screen.blit(timer_txt, (self.x - timer_txt.get_width() // 2, self.y - 30)))
+
+        return rect
\ No newline at end of file
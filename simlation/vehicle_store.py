@@ -0,0 +1,540 @@
+# simulation/vehicle_store.py
+import math
+
+import numpy as np
+
+from simulation.config import (WIDTH, HEIGHT, STOP_OFFSET, VEHICLE_WIDTH, VEHICLE_HEIGHT, BASE_SPEED, ACCELERATION,
+                               DECELERATION, STOP_LINE_TOLERANCE, LANE_WIDTH, DILEMMA_ZONE_DISTANCE, BRAKING_DISTANCE)
+from simulation.vehicle import Vehicle, DIRECTIONS, BOX_LEFT, BOX_TOP, BOX_RIGHT, BOX_BOTTOM
+from simulation.occupancy import ConflictZone
+from simulation.counters import TrafficCounters
+
+DIR_CODE = {d: i for i, d in enumerate(DIRECTIONS)}
+# Per direction code: which axis the vehicle travels on and which way.
+# N moves down the screen (+y), S up (-y), E left (-x), W right (+x).
+ON_Y_AXIS = np.array([True, True, False, False])
+TRAVEL_SIGN = np.array([1.0, -1.0, -1.0, 1.0])
+
+LIGHT_RED, LIGHT_YELLOW, LIGHT_GREEN, LIGHT_OFF = 0, 1, 2, 3
+LIGHT_CODE = {"red": LIGHT_RED, "yellow": LIGHT_YELLOW, "green": LIGHT_GREEN}
+
+CX, CY = WIDTH // 2, HEIGHT // 2
+NO_VEHICLE = -1
+# Up to this many vehicles step() works on Python lists: below it the fixed cost
+# of each NumPy call outweighs what the array operations save.
+SCALAR_STEP_MAX = 64
+# Per direction code, as plain Python values for the list path.
+_ON_Y = tuple(ON_Y_AXIS.tolist())
+_SIGN = tuple(TRAVEL_SIGN.tolist())
+_CENTER = tuple(CY if on_y else CX for on_y in _ON_Y)
+
+# One row per vehicle leaving the store, as returned by remove_out_of_bounds.
+# stop_time and cross_time are NaN for vehicles that never stopped / crossed.
+EXIT_DTYPE = np.dtype([
+    ("id", np.int64), ("direction", np.int8), ("lane", np.int8), ("emergency", np.bool_),
+    ("spawn_time", np.float64), ("stop_time", np.float64), ("cross_time", np.float64), ("delay", np.float64),
+])
+
+def light_slot(direction_code, lane):
+    return direction_code * 2 + lane - 1
+
+def start_position(direction, lane, width, height):
+    offset = (LANE_WIDTH * 0.5) if lane == 1 else (LANE_WIDTH * 1.5)
+    if direction == "N": return (CX + offset, -height)
+    if direction == "S": return (CX - offset, HEIGHT)
+    if direction == "E": return (WIDTH, CY - offset)
+    if direction == "W": return (-width, CY + offset)
+    return (0, 0)
+
+# Structure-of-arrays store for every live vehicle. Slots [0, count) are live;
+# removal swaps the last slot into the hole so arrays stay dense.
+# Each (direction, lane) also keeps an ordered queue as a doubly linked list:
+# ahead/behind hold the neighbouring slots, lane_head/lane_tail the two ends.
+class VehicleStore:
+    FIELDS = {
+        "ids": np.int64, "x": np.float64, "y": np.float64, "prev_x": np.float64, "prev_y": np.float64, "speed": np.float64,
+        "width": np.float64, "height": np.float64, "direction": np.int8, "lane": np.int8,
+        "emergency": np.bool_, "crossed": np.bool_, "in_box": np.bool_,
+        "queued": np.bool_, "waiting": np.bool_, "delay": np.float64,
+        "spawn_time": np.float64, "stop_time": np.float64, "cross_time": np.float64,
+        "ahead": np.int32, "behind": np.int32,
+    }
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.count = 0
+        self.next_id = 0
+        self.views = []
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.lane_head = [NO_VEHICLE] * 8
+        self.lane_tail = [NO_VEHICLE] * 8
+        self.box = ConflictZone(BOX_LEFT, BOX_TOP, BOX_RIGHT, BOX_BOTTOM)
+        self.counters = TrafficCounters()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.views[:self.count])
+
+    def __getitem__(self, slot):
+        return self.views[slot]
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(self.capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, direction, lane, is_emergency=False, now=0.0):
+        if self.count == self.capacity:
+            self._grow()
+        i = self.count
+        width, height = (VEHICLE_WIDTH, VEHICLE_HEIGHT) if direction in ("N", "S") else (VEHICLE_HEIGHT, VEHICLE_WIDTH)
+        self.ids[i] = self.next_id
+        self.x[i], self.y[i] = start_position(direction, lane, width, height)
+        self.prev_x[i], self.prev_y[i] = self.x[i], self.y[i]
+        self.speed[i] = BASE_SPEED
+        self.width[i], self.height[i] = width, height
+        self.direction[i] = DIR_CODE[direction]
+        self.lane[i] = lane
+        self.emergency[i] = is_emergency
+        self.crossed[i] = False
+        self.in_box[i] = False
+        self.queued[i] = self.waiting[i] = False
+        self.delay[i] = 0.0
+        self.spawn_time[i] = now
+        self.stop_time[i] = self.cross_time[i] = np.nan
+        self._link_tail(i, light_slot(DIR_CODE[direction], lane))
+        self.counters.vehicle_added(self.next_id, DIR_CODE[direction], is_emergency)
+        self.next_id += 1
+        self.count += 1
+        view = Vehicle(self, i)
+        self.views.append(view)
+        return view
+
+    def remove(self, slot):
+        last = self.count - 1
+        removed = self.views[slot]
+        self._unlink(slot)
+        vehicle_id, direction_code = int(self.ids[slot]), int(self.direction[slot])
+        if self.in_box[slot]:
+            self.box.leave(direction_code)
+        self.counters.vehicle_removed(vehicle_id, direction_code, bool(self.emergency[slot]),
+                                      int(self.queued[slot]), int(self.waiting[slot]))
+        if slot != last:
+            for name in self.FIELDS:
+                arr = getattr(self, name)
+                arr[slot] = arr[last]
+            self._relink_moved(slot)
+            moved = self.views[last]
+            moved.slot = slot
+            self.views[slot] = moved
+        self.views.pop()
+        self.count = last
+        removed.store, removed.slot = None, None
+
+    # --- Per-lane queues ---
+    def _group(self, slot):
+        return light_slot(int(self.direction[slot]), int(self.lane[slot]))
+
+    def _link_tail(self, slot, group):
+        # New vehicles enter at the lane start, so they always join the back of the queue.
+        tail = self.lane_tail[group]
+        self.ahead[slot] = tail
+        self.behind[slot] = NO_VEHICLE
+        if tail == NO_VEHICLE:
+            self.lane_head[group] = slot
+        else:
+            self.behind[tail] = slot
+        self.lane_tail[group] = slot
+
+    def _unlink(self, slot):
+        group = self._group(slot)
+        a, b = int(self.ahead[slot]), int(self.behind[slot])
+        if a == NO_VEHICLE: self.lane_head[group] = b
+        else: self.behind[a] = b
+        if b == NO_VEHICLE: self.lane_tail[group] = a
+        else: self.ahead[b] = a
+
+    def _relink_moved(self, slot):
+        # Point the neighbours (or lane ends) of a vehicle that was just moved into slot at it.
+        group = self._group(slot)
+        a, b = int(self.ahead[slot]), int(self.behind[slot])
+        if a == NO_VEHICLE: self.lane_head[group] = slot
+        else: self.behind[a] = slot
+        if b == NO_VEHICLE: self.lane_tail[group] = slot
+        else: self.ahead[b] = slot
+
+    def lane_queue(self, group):
+        slots, slot = [], self.lane_head[group]
+        while slot != NO_VEHICLE:
+            slots.append(slot)
+            slot = int(self.behind[slot])
+        return slots
+
+    def _reorder_lane(self, group, progress):
+        slots = sorted(self.lane_queue(group), key=lambda s: -progress[s])
+        self.lane_head[group] = self.lane_tail[group] = NO_VEHICLE
+        for slot in slots:
+            self._link_tail(slot, group)
+
+    def _repair_order(self, progress):
+        # Emergency and crossed vehicles ignore the car in front and can overtake it;
+        # re-sort just the lanes where a follower has ended up ahead of its leader.
+        n = self.count
+        ahead = self.ahead[:n]
+        inverted = (ahead != NO_VEHICLE) & (progress[ahead] < progress)
+        if inverted.any():
+            for slot in np.flatnonzero(inverted):
+                if self.ahead[slot] != NO_VEHICLE and progress[self.ahead[slot]] < progress[slot]:
+                    self._reorder_lane(self._group(slot), progress)
+
+    # --- Per-vehicle geometry, all as arrays over the live slots ---
+    def _axis_coord(self, n):
+        return np.where(ON_Y_AXIS[self.direction[:n]], self.y[:n], self.x[:n])
+
+    def progress(self):
+        n = self.count
+        return TRAVEL_SIGN[self.direction[:n]] * self._axis_coord(n)
+
+    def distance_to_stop_line(self):
+        n = self.count
+        d = self.direction[:n]
+        on_y, sign = ON_Y_AXIS[d], TRAVEL_SIGN[d]
+        coord = self._axis_coord(n)
+        size = np.where(on_y, self.height[:n], self.width[:n])
+        front = np.where(sign > 0, coord + size, coord)
+        line = np.where(on_y, CY, CX) - sign * STOP_OFFSET
+        return sign * (line - front)
+
+    def passed_intersection(self):
+        n = self.count
+        d = self.direction[:n]
+        center = np.where(ON_Y_AXIS[d], CY, CX)
+        return TRAVEL_SIGN[d] * (self._axis_coord(n) - center) > 10
+
+    def in_intersection_box(self):
+        n = self.count
+        return self.box.contains(self.x[:n], self.y[:n], self.width[:n], self.height[:n])
+
+    def _sync_box(self):
+        # Register box entries and exits since the last tick with the occupancy index.
+        n = self.count
+        inside = self.in_intersection_box()
+        for slot in np.flatnonzero(inside != self.in_box[:n]):
+            if inside[slot]:
+                self.box.enter(int(self.direction[slot]))
+            else:
+                self.box.leave(int(self.direction[slot]))
+        self.in_box[:n] = inside
+
+    def leader_gap(self, progress=None):
+        # Distance to the nearest vehicle strictly ahead in the same queue, inf if none.
+        n = self.count
+        progress = self.progress() if progress is None else progress
+        ahead = self.ahead[:n]
+        has_leader = ahead != NO_VEHICLE
+        gap = np.full(n, np.inf)
+        gap[has_leader] = progress[ahead[has_leader]] - progress[has_leader]
+        # Vehicles level with their leader (a pile-up at the spawn point) look further up
+        # the queue, like the full scan did: follow the tie run to its front by pointer doubling.
+        tied = gap <= 0
+        if tied.any():
+            root = np.where(tied, ahead, np.arange(n))
+            while True:
+                nxt = root[root]
+                if np.array_equal(nxt, root):
+                    break
+                root = nxt
+            gap = gap[root]
+        return gap
+
+    def vehicle_ahead(self, progress=None):
+        # Blocked when the leader is closer than the safe distance (1.5 car lengths)
+        # plus one car length.
+        n = self.count
+        return self.leader_gap(progress) < self.height[:n] * 2.5
+
+    # --- Batched replacement for the per-object Vehicle.move ---
+    def step(self, light_codes, dt, now=0.0):
+        n = self.count
+        if n == 0 or dt <= 0:
+            return
+        if n <= SCALAR_STEP_MAX:
+            return self._step_small(light_codes, dt, now)
+        d = self.direction[:n]
+        speed = self.speed[:n]
+
+        newly_crossed = self.passed_intersection() & ~self.crossed[:n]
+        if newly_crossed.any():
+            self.crossed[:n] |= newly_crossed
+            self.cross_time[:n][newly_crossed] = now
+            self.counters.vehicles_crossed(self.direction[:n][newly_crossed])
+            for vehicle_id in self.ids[:n][newly_crossed & self.emergency[:n]]:
+                self.counters.emergency_crossed(int(vehicle_id))
+        free = self.emergency[:n] | self.crossed[:n]
+
+        dist = self.distance_to_stop_line()
+        before = dist > 0
+        light = light_codes[d * 2 + self.lane[:n] - 1]
+        stop_signal = ((light == LIGHT_RED) & before) | ((light == LIGHT_YELLOW) & (dist > DILEMMA_ZONE_DISTANCE) & before)
+        progress = self.progress()
+        self._repair_order(progress)
+        ahead = self.vehicle_ahead(progress)
+
+        on_y = ON_Y_AXIS[d]
+        self._sync_box()
+        cross_in_box = self.box.blocked_approaches()[d]
+        at_line = np.abs(dist) < STOP_LINE_TOLERANCE
+        cross = ~stop_signal & ~ahead & at_line & cross_in_box
+        must_stop = stop_signal | ahead | cross
+
+        # Speeds are px/s; a vehicle that would reach the stop line this tick is slowed
+        # to land exactly on it.
+        snap = must_stop & (speed * dt > dist) & (dist >= 0)
+        brake = must_stop & ~snap & (ahead | (dist <= BRAKING_DISTANCE))
+        halt = must_stop & ~snap & ~brake & ~before
+        new_speed = np.where(must_stop, BASE_SPEED, np.minimum(BASE_SPEED, speed + ACCELERATION * dt))
+        new_speed = np.where(snap, np.maximum(0, dist) / dt, new_speed)
+        new_speed = np.where(brake, np.maximum(0, speed - DECELERATION * dt), new_speed)
+        new_speed[halt] = 0
+        new_speed[free] = BASE_SPEED
+        self.speed[:n] = new_speed
+        # Delay is the time lost against driving at full speed the whole way.
+        self.delay[:n] += (1.0 - new_speed / BASE_SPEED) * dt
+
+        # Stopped vehicles do not move this tick, so "before the line" is still current.
+        queued = new_speed == 0
+        waiting = queued & before
+        self.counters.apply_changes(self.counters.queued, d, self.queued[:n], queued)
+        self.counters.apply_changes(self.counters.waiting, d, self.waiting[:n], waiting)
+        self.queued[:n] = queued
+        first_stop = queued & np.isnan(self.stop_time[:n])
+        if first_stop.any():
+            self.stop_time[:n][first_stop] = now
+        self.waiting[:n] = waiting
+
+        # prev_x/prev_y keep the start-of-tick position for render interpolation.
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        delta = TRAVEL_SIGN[d] * new_speed * dt
+        self.y[:n] += np.where(on_y, delta, 0)
+        self.x[:n] += np.where(on_y, 0, delta)
+
+    def _step_small(self, light_codes, dt, now):
+        # step() one vehicle at a time on Python floats. Same rules and the same
+        # float operations in the same order, so both paths give identical results.
+        n = self.count
+        counters, box = self.counters, self.box
+        d, lane = self.direction[:n].tolist(), self.lane[:n].tolist()
+        x, y = self.x[:n].tolist(), self.y[:n].tolist()
+        width, height = self.width[:n].tolist(), self.height[:n].tolist()
+        speed, delay = self.speed[:n].tolist(), self.delay[:n].tolist()
+        crossed, emergency, in_box = self.crossed[:n].tolist(), self.emergency[:n].tolist(), self.in_box[:n].tolist()
+        dist, progress = [0.0] * n, [0.0] * n
+
+        newly_crossed, box_changed = [], False
+        for i in range(n):
+            k = d[i]
+            sign, center = _SIGN[k], _CENTER[k]
+            coord, size = (y[i], height[i]) if _ON_Y[k] else (x[i], width[i])
+            if not crossed[i] and sign * (coord - center) > 10:
+                newly_crossed.append(i)
+            dist[i] = sign * ((center - sign * STOP_OFFSET) - (coord + size if sign > 0 else coord))
+            progress[i] = sign * coord
+            inside = x[i] < box.right and x[i] + width[i] > box.left and y[i] < box.bottom and y[i] + height[i] > box.top
+            if inside != in_box[i]:
+                box.enter(k) if inside else box.leave(k)
+                in_box[i], box_changed = inside, True
+        if box_changed:
+            self.in_box[:n] = in_box
+        if newly_crossed:
+            self.crossed[newly_crossed] = True
+            self.cross_time[newly_crossed] = now
+            counters.vehicles_crossed(self.direction[newly_crossed])
+            for i in newly_crossed:
+                crossed[i] = True
+                if emergency[i]:
+                    counters.emergency_crossed(int(self.ids[i]))
+
+        # _repair_order and leader_gap.
+        ahead = self.ahead[:n].tolist()
+        inverted = [i for i in range(n) if ahead[i] != NO_VEHICLE and progress[ahead[i]] < progress[i]]
+        if inverted:
+            for i in inverted:
+                a = int(self.ahead[i])
+                if a != NO_VEHICLE and progress[a] < progress[i]:
+                    self._reorder_lane(self._group(i), progress)
+            ahead = self.ahead[:n].tolist()
+        gap = [math.inf if a == NO_VEHICLE else progress[a] - progress[i] for i, a in enumerate(ahead)]
+        blocked = [False] * n
+        for i in range(n):
+            g = gap[i]
+            if g <= 0:
+                a = ahead[i]
+                while gap[a] <= 0:
+                    a = ahead[a]
+                g = gap[a]
+            blocked[i] = g < height[i] * 2.5
+
+        codes = light_codes.tolist()
+        cross_in_box = box.blocked_approaches().tolist()
+        queued, waiting = [False] * n, [False] * n
+        queued_before, waiting_before = self.queued[:n].tolist(), self.waiting[:n].tolist()
+        for i in range(n):
+            k, s, di = d[i], speed[i], dist[i]
+            before = di > 0
+            light = codes[k * 2 + lane[i] - 1]
+            stop_signal = before and (light == LIGHT_RED or (light == LIGHT_YELLOW and di > DILEMMA_ZONE_DISTANCE))
+            cross = not stop_signal and not blocked[i] and abs(di) < STOP_LINE_TOLERANCE and cross_in_box[k]
+            if emergency[i] or crossed[i]:
+                new = BASE_SPEED
+            elif stop_signal or blocked[i] or cross:
+                if s * dt > di and di >= 0:
+                    new = di / dt
+                elif blocked[i] or di <= BRAKING_DISTANCE:
+                    new = s - DECELERATION * dt
+                    new = new if new >= 0 else 0.0
+                elif not before:
+                    new = 0.0
+                else:
+                    new = BASE_SPEED
+            else:
+                new = s + ACCELERATION * dt
+                new = new if new < BASE_SPEED else BASE_SPEED
+            speed[i] = new
+            delay[i] += (1.0 - new / BASE_SPEED) * dt
+            queued[i] = new == 0
+            waiting[i] = queued[i] and before
+            if queued[i] != queued_before[i]:
+                counters.queued[k] += 1 if queued[i] else -1
+            if queued[i] and math.isnan(self.stop_time[i]):
+                self.stop_time[i] = now
+            if waiting[i] != waiting_before[i]:
+                counters.waiting[k] += 1 if waiting[i] else -1
+            if _ON_Y[k]:
+                y[i] += _SIGN[k] * new * dt
+            else:
+                x[i] += _SIGN[k] * new * dt
+
+        self.speed[:n] = speed
+        self.delay[:n] = delay
+        self.queued[:n] = queued
+        self.waiting[:n] = waiting
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        self.x[:n] = x
+        self.y[:n] = y
+
+    # --- Fast-forward support (see simulation/events.py) ---
+    def quiet_time(self, light_codes, dt, margin):
+        # Seconds for which step() would leave every speed as it is, so the vehicles can
+        # be moved in one go: each one is cruising at BASE_SPEED or stopped, and none
+        # reaches the stop-line zone, crosses, leaves, or closes on / pulls away from the
+        # vehicle ahead before then. 0 when some vehicle is changing speed already.
+        n = self.count
+        if n == 0:
+            return np.inf
+        speed = self.speed[:n]
+        cruising = speed == BASE_SPEED
+        stopped = speed == 0
+        free = self.emergency[:n] | self.crossed[:n]
+        if not (cruising | stopped).all() or (stopped & free).any():
+            return 0.0
+        d = self.direction[:n]
+        groups = d * 2 + self.lane[:n] - 1
+        progress = self.progress()
+        self._repair_order(progress)
+        gap = self.leader_gap(progress)
+        if (gap <= 0).any():
+            return 0.0
+        # Free vehicles drive through stopped ones; let ticks re-link the lane when they do.
+        stopped_front = np.full(8, -np.inf)
+        np.maximum.at(stopped_front, groups[stopped], progress[stopped])
+        if (free & (progress < stopped_front[groups])).any():
+            return 0.0
+
+        safe = self.height[:n] * 2.5
+        ahead = gap < safe
+        leader = self.ahead[:n]
+        leader_stopped = np.zeros(n, dtype=np.bool_)
+        has_leader = leader != NO_VEHICLE
+        leader_stopped[has_leader] = stopped[leader[has_leader]]
+        dist = self.distance_to_stop_line()
+        before = dist > 0
+        t = np.full(n, np.inf)
+
+        # Cruising vehicles still subject to signals keep full speed until they are
+        # within braking distance (or one tick) of the stop line or too close behind.
+        approaching = cruising & ~free
+        zone = max(BRAKING_DISTANCE, BASE_SPEED * dt)
+        if (approaching & (ahead | ((dist <= zone) & (dist >= -STOP_LINE_TOLERANCE)))).any():
+            return 0.0
+        upstream = approaching & (dist > zone)
+        t[upstream] = (dist[upstream] - zone) / BASE_SPEED
+        closing = approaching & leader_stopped
+        t[closing] = np.minimum(t[closing], (gap[closing] - safe[closing]) / BASE_SPEED)
+
+        # Stopped vehicles stay put while held by the signal at the line or by a stopped
+        # vehicle ahead; one held only by a moving vehicle ahead starts when the gap opens.
+        light = light_codes[groups]
+        stop_signal = ((light == LIGHT_RED) & before) | ((light == LIGHT_YELLOW) & (dist > DILEMMA_ZONE_DISTANCE) & before)
+        anchored = stop_signal & ((dist <= BRAKING_DISTANCE) | ~before)
+        held = stopped & ~anchored
+        if (held & ~ahead).any():
+            return 0.0
+        opening = held & ~leader_stopped
+        t[opening] = np.minimum(t[opening], (safe[opening] - gap[opening]) / BASE_SPEED)
+
+        # Crossing the junction and leaving the tile.
+        on_y, sign = ON_Y_AXIS[d], TRAVEL_SIGN[d]
+        uncrossed = cruising & ~self.crossed[:n]
+        cross_at = sign * np.where(on_y, CY, CX) + 10
+        t[uncrossed] = np.minimum(t[uncrossed], (cross_at - progress)[uncrossed] / BASE_SPEED)
+        exit_at = np.where(sign > 0, np.where(on_y, HEIGHT, WIDTH) + margin, margin)
+        t[cruising] = np.minimum(t[cruising], (exit_at - progress)[cruising] / BASE_SPEED)
+        return float(t.min())
+
+    def cruise(self, ticks, dt):
+        # Moves every vehicle `ticks` ticks on at its current speed, as step() would
+        # while quiet_time() allows it. The per-tick increments are added one tick at a
+        # time so positions round exactly as they would have tick by tick.
+        n = self.count
+        d = self.direction[:n]
+        speed = self.speed[:n]
+        on_y = ON_Y_AXIS[d]
+        delta = TRAVEL_SIGN[d] * speed * dt
+        dy, dx = np.where(on_y, delta, 0), np.where(on_y, 0, delta)
+        lost = (1.0 - speed / BASE_SPEED) * dt
+        x, y, delay = self.x[:n], self.y[:n], self.delay[:n]
+        for i in range(ticks):
+            if i == ticks - 1:
+                self.prev_x[:n] = x
+                self.prev_y[:n] = y
+            x += dx
+            y += dy
+            delay += lost
+
+    def remove_out_of_bounds(self, margin):
+        # Returns an EXIT_DTYPE record for every vehicle that left.
+        n = self.count
+        # Descending order so a swapped-in last slot is never one still waiting to go.
+        if n <= SCALAR_STEP_MAX:
+            slots = [i for i, (x, y) in enumerate(zip(self.x[:n].tolist(), self.y[:n].tolist()))
+                     if x < -margin or x > WIDTH + margin or y < -margin or y > HEIGHT + margin][::-1]
+        else:
+            x, y = self.x[:n], self.y[:n]
+            out = (x < -margin) | (x > WIDTH + margin) | (y < -margin) | (y > HEIGHT + margin)
+            slots = np.flatnonzero(out)[::-1]
+        if len(slots) == 0:
+            return np.empty(0, dtype=EXIT_DTYPE)
+        exits = np.empty(len(slots), dtype=EXIT_DTYPE)
+        for name in EXIT_DTYPE.names:
+            exits[name] = getattr(self, "ids" if name == "id" else name)[slots]
+        for slot in slots:
+            self.remove(int(slot))
+        return exits
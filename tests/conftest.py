@@ -0,0 +1,18 @@
+# tests/conftest.py
+# The code imports the package as `simulation` but it lives in simlation/, so
+# load it under that name; the repo root goes on the path for ai/.
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.join(ROOT, "simlation")
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+if importlib.util.find_spec("simulation") is None:
+    spec = importlib.util.spec_from_file_location("simulation", os.path.join(PACKAGE, "__init__.py"),
+                                                  submodule_search_locations=[PACKAGE])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["simulation"] = module
+    spec.loader.exec_module(module)
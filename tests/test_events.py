@@ -0,0 +1,27 @@
+# tests/test_events.py
+import pytest
+
+from simulation.engine import Simulation
+from simulation.events import EventScheduler
+
+def _state(sim):
+    p = sim.predictor
+    return (sim.ticks, sim.state_digest(), sim.exited, sim.total_delay, p.arrival_rate.tobytes(),
+            p.discharge_rate.tobytes(), p.waiting.tobytes())
+
+@pytest.mark.parametrize("interval, smart", [(4.0, True), (2.0, False), (0.8, True)])
+def test_fast_forward_matches_ticking(interval, smart):
+    ticked = Simulation(seed=11, spawn_interval=interval, is_smart_mode=smart)
+    skipped = Simulation(seed=11, spawn_interval=interval, is_smart_mode=smart)
+    schedulers = []
+    for sim in (ticked, skipped):
+        scheduler = EventScheduler(sim)
+        scheduler.schedule(100, sim.spawn_emergency)
+        scheduler.schedule(200, sim.toggle_mode)
+        schedulers.append(scheduler)
+    while ticked.time < 300 - ticked.dt / 2:
+        schedulers[0]._fire_due()
+        ticked.tick()
+    skipped.fast_forward(300, schedulers[1])
+    assert schedulers[1].stats()["ticks_skipped"] > 0
+    assert _state(skipped) == _state(ticked)
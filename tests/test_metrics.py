@@ -0,0 +1,25 @@
+# tests/test_metrics.py
+import numpy as np
+import pytest
+
+from simulation.engine import Simulation
+from simulation.metrics import MetricsRecorder, load_metrics
+
+def _run(path, fast, sample_every, seconds=300):
+    sim = Simulation(seed=11, spawn_interval=4.0)
+    sim.metrics = MetricsRecorder(str(path), capacity=500, sample_every=sample_every)
+    if fast:
+        sim.fast_forward(seconds)
+    else:
+        while sim.time < seconds - sim.dt / 2:
+            sim.tick()
+    sim.metrics.close()
+    return load_metrics(str(path))["ticks"]
+
+@pytest.mark.parametrize("sample_every", [1, 7])
+def test_fast_forward_keeps_every_tick_row(tmp_path, sample_every):
+    ticked = _run(tmp_path / "ticked", False, sample_every)
+    skipped = _run(tmp_path / "skipped", True, sample_every)
+    assert len(ticked["tick"]) == 300 * 60 // sample_every
+    for name in ticked:
+        assert np.array_equal(ticked[name], skipped[name]), name
@@ -0,0 +1,47 @@
+# tests/test_profiler.py
+import types
+
+from simulation.profiler import Profiler
+
+def _module():
+    module = types.ModuleType("fake_display")
+    module.update = lambda rects=None: "updated"
+    return module
+
+def test_module_target_survives_enable_disable_cycles():
+    module = _module()
+    original = module.update
+    profiler = Profiler()
+    profiler.attach(module, "update", "render.display")
+    for _ in range(2):
+        profiler.enable()
+        assert module.update is not original
+        assert module.update() == "updated"
+        profiler.disable()
+        assert module.update is original
+    profiler.enable()
+    assert module.update() == "updated"
+    assert profiler.sections["render.display"].count == 3
+
+def test_method_target_falls_back_to_the_class():
+    class Target:
+        def step(self):
+            return 1
+    target = Target()
+    profiler = Profiler(enabled=True)
+    profiler.attach(target, "step")
+    assert "step" in vars(target)
+    profiler.disable()
+    assert "step" not in vars(target)
+    assert target.step() == 1
+
+def test_double_attach_restores_the_original():
+    module = _module()
+    original = module.update
+    profiler = Profiler(enabled=True)
+    profiler.attach(module, "update", "a")
+    profiler.attach(module, "update", "b")
+    module.update()
+    assert profiler.sections["a"].count == profiler.sections["b"].count == 1
+    profiler.disable()
+    assert module.update is original
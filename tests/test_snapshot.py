@@ -0,0 +1,36 @@
+# tests/test_snapshot.py
+import pytest
+
+from simulation.config import DEMAND_PROFILE
+from simulation.demand import DemandProfile, load_profile
+from simulation.engine import Simulation
+from simulation.snapshot import fork
+
+@pytest.mark.parametrize("make", [
+    lambda: load_profile(DEMAND_PROFILE),
+    lambda: DemandProfile(30, {"N": [900, 300], "E": [200, 700]}, lane_shares={"N": [0.2, 0.9]}, repeat=False,
+                          distribution="empirical", headways=[0.5, 1.0, 3.0]),
+], ids=["data", "empirical"])
+def test_fork_continues_demand_driven_run(make):
+    sim = Simulation(seed=3, demand=make())
+    sim.run(200)
+    copy = fork(sim)
+    assert copy.demand.profile is not sim.demand.profile
+    for _ in range(120 * 60):
+        sim.tick()
+        copy.tick()
+        assert copy.state_digest() == sim.state_digest()
+    assert copy.exited == sim.exited and copy.demand.stats() == sim.demand.stats()
+
+def test_fork_keeps_lookahead_options():
+    options = {"budget": None, "extensions": (0, 3), "cycles": 3, "recheck": 1.5, "quantum": 0.25, "cache_size": 64}
+    sim = Simulation(seed=5, spawn_interval=0.8, lookahead=options)
+    sim.run(120)
+    copy = fork(sim)
+    for name, value in options.items():
+        assert getattr(copy.optimizer, name) == value, name
+    assert sim.optimizer.cache and list(copy.optimizer.cache.items()) == list(sim.optimizer.cache.items())
+    for _ in range(120 * 60):
+        sim.tick()
+        copy.tick()
+        assert copy.state_digest() == sim.state_digest()
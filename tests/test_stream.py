@@ -0,0 +1,47 @@
+# tests/test_stream.py
+import numpy as np
+import pytest
+
+from simulation.engine import Simulation
+from simulation.stream import (DELTA, HEADER, KEYFRAME, LIGHT_BLOCK, LIGHTS, SIGNAL_BLOCK, SIGNALS, STATUS,
+                               STATUS_BLOCK, FrameDecoder, FrameEncoder)
+
+def _frames(count=400, keyframe_every=25):
+    sim = Simulation(seed=8, spawn_interval=0.3)
+    sim.run(30)
+    encoder = FrameEncoder(keyframe_every)
+    for i in range(count):
+        sim.step(3)
+        if i == 150:
+            sim.spawn_emergency()
+        frame, _ = encoder.encode(sim)
+        yield sim, encoder, frame
+
+def test_decoder_tracks_encoder():
+    decoder = FrameDecoder()
+    kinds, removals = set(), 0
+    for sim, encoder, frame in _frames():
+        kind, _, _, tick, _, _, removed = HEADER.unpack_from(frame)
+        kinds.add(kind)
+        removals += kind == DELTA and removed > 0
+        decoder.apply(frame)
+        store = sim.vehicles
+        n = store.count
+        order = np.argsort(store.ids[:n])
+        assert decoder.tick == tick == sim.ticks
+        assert decoder.vehicles["id"].tolist() == store.ids[:n][order].tolist()
+        assert np.array_equal(decoder.vehicles["x"], np.rint(store.x[:n][order]))
+        assert np.array_equal(decoder.vehicles["y"], np.rint(store.y[:n][order]))
+        assert decoder.signals == SIGNAL_BLOCK.unpack(encoder.blocks[SIGNALS])
+        assert decoder.lights == LIGHT_BLOCK.unpack(encoder.blocks[LIGHTS])
+        assert decoder.status == STATUS_BLOCK.unpack(encoder.blocks[STATUS])
+    assert kinds == {KEYFRAME, DELTA}
+    assert removals > 0
+
+def test_sequence_gap_raises():
+    decoder = FrameDecoder()
+    frames = _frames(count=5)
+    decoder.apply(next(frames)[2])
+    next(frames)  # lost in transit
+    with pytest.raises(ValueError):
+        decoder.apply(next(frames)[2])
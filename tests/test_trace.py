@@ -0,0 +1,42 @@
+# tests/test_trace.py
+import random
+
+import pytest
+
+from simulation.engine import Simulation
+from simulation.trace import ReplayDivergence, replay
+
+def _record(path, lookahead=None):
+    sim = Simulation(seed=21, spawn_interval=0.6, lookahead=lookahead)
+    sim.run(60)  # recording starts mid-run
+    sim.record(path, checkpoint_every=120)
+    frames = random.Random(4)
+    for second in range(90):
+        if second % 25 == 10:
+            sim.spawn_emergency()
+        if second % 40 == 30:
+            sim.toggle_mode()
+        for _ in range(20):
+            sim.advance(frames.uniform(0.005, 0.09))
+        if second % 30 == 0:
+            sim.tick(1.0 / 30)
+    sim.stop_recording()
+    return sim
+
+@pytest.mark.parametrize("lookahead", [None, {"budget": None, "cycles": 3}], ids=["smart", "lookahead"])
+def test_replay_reproduces_run(tmp_path, lookahead):
+    path = str(tmp_path / "run.trace")
+    sim = _record(path, lookahead)
+    copy = replay(path)
+    assert copy.ticks == sim.ticks
+    assert copy.state_digest() == sim.state_digest()
+    assert (copy.exited, copy.total_delay, copy.is_smart_mode) == (sim.exited, sim.total_delay, sim.is_smart_mode)
+
+def test_replay_detects_divergence(tmp_path):
+    path = str(tmp_path / "run.trace")
+    _record(path)
+    with open(path, "r+b") as f:
+        f.seek(-8, 2)  # value of the closing CHECK record
+        f.write(b"\xff" * 8)
+    with pytest.raises(ReplayDivergence):
+        replay(path)
@@ -0,0 +1,27 @@
+# tests/test_vehicle_store.py
+import pytest
+
+import simulation.vehicle_store as vehicle_store
+from simulation.bench import build_case
+from simulation.engine import Simulation
+
+def _run(monkeypatch, limit, make, ticks=3600):
+    monkeypatch.setattr(vehicle_store, "SCALAR_STEP_MAX", limit)
+    sim = make()
+    digests = []
+    for _ in range(ticks):
+        sim.tick()
+        digests.append(sim.state_digest())
+    store, counters = sim.vehicles, sim.vehicles.counters
+    n = store.count
+    return (digests, sim.exited, sim.total_delay, counters.queued.tolist(), counters.waiting.tolist(),
+            counters.crossed.tolist(), store.delay[:n].tobytes(), store.stop_time[:n].tobytes(),
+            store.in_box[:n].tobytes(), store.box.counts.tolist())
+
+@pytest.mark.parametrize("make", [
+    lambda: Simulation(seed=6, spawn_interval=0.3),
+    lambda: build_case("emergency", 40),
+    lambda: build_case("saturated", 60),
+], ids=["busy", "emergency", "saturated"])
+def test_list_and_array_steps_match(monkeypatch, make):
+    assert _run(monkeypatch, 10 ** 9, make) == _run(monkeypatch, 0, make)